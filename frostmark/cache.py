@@ -0,0 +1,218 @@
+'''
+Module for caching the values built from the whole internal DB.
+'''
+
+from threading import RLock
+
+from ensure import ensure_annotations
+
+from frostmark import db_base
+from frostmark.common import fetch_bookmark_tree
+from frostmark.db import get_session, get_generation
+from frostmark.editor.events import (
+    ChangeEvent, MOVE, RENAME, URL_CHANGE, INSERT, DELETE
+)
+from frostmark.models import Folder, Bookmark
+from frostmark.tree import TreeNode, traverse
+
+
+@ensure_annotations
+def current_key() -> tuple:
+    '''
+    Return ``(path, token, value)`` identifying the current state
+    of the DB at `DB_PATH`, see `frostmark.db.get_generation`.
+    '''
+
+    session = get_session()
+    try:
+        return (db_base.DB_PATH, ) + get_generation(session)
+    finally:
+        session.close()
+
+
+class TreeCache:
+    '''
+    Values built from the whole bookmark tree (e.g. the tree itself or its
+    JSON) kept until the DB generation changes, therefore a repeated read
+    of an unchanged DB costs a single query of the generation row.
+
+    The cached values are shared, they must not be modified.
+    '''
+
+    def __init__(self):
+        self.lock = RLock()
+        self.key = None
+        self.values = {}
+
+    @ensure_annotations
+    def get(self, name: str, build):
+        '''
+        Return a cached value by its `name` or call `build` to create it
+        if there's none for the current DB generation.
+        '''
+
+        key = current_key()
+        with self.lock:
+            if key != self.key:
+                self.key = key
+                self.values = {}
+            if name not in self.values:
+                self.values[name] = build()
+            return self.values[name]
+
+    def clear(self):
+        '''
+        Drop all of the cached values.
+        '''
+        with self.lock:
+            self.key = None
+            self.values = {}
+
+
+def _attach(parent: TreeNode, node: TreeNode):
+    '''
+    Add a child keeping the order of `fetch_bookmark_tree`, i.e. folders
+    first, bookmarks second, each by ID. New items have the highest IDs,
+    therefore they are appended right away.
+    '''
+
+    key = (node.node_type != Folder, node.id)
+    children = parent.children
+    idx = len(children)
+    while idx and (
+            children[idx - 1].node_type != Folder, children[idx - 1].id
+    ) > key:
+        idx -= 1
+    node.parent = parent
+    children.insert(idx, node)
+
+
+def _detach(node: TreeNode):
+    '''
+    Remove a node from its parent's children.
+    '''
+    node.parent.children.remove(node)
+    node.parent = None
+
+
+class TreeHolder:
+    '''
+    Bookmark tree kept in memory and patched by the editor's change events
+    (see `frostmark.editor.Editor.subscribe`), therefore a small edit does
+    not fetch the whole tree again.
+
+    A patch touches only the changed node and its old and new parent,
+    a folder move walks up from the new parent to reject a cycle.
+    The tree is fetched again only if the DB changed in another way
+    (e.g. an import or another process), i.e. when the DB generation
+    does not match the one the tree was patched to.
+
+    The tree is shared, it must not be modified outside of the holder
+    and should be read within `read` to not see a half-applied patch.
+    '''
+
+    def __init__(self, fetch=fetch_bookmark_tree):
+        self.fetch = fetch
+        self.lock = RLock()
+        self.key = None
+        self.tree = None
+        self.nodes = {}
+
+    def get(self) -> TreeNode:
+        '''
+        Return the tree of the current DB generation.
+        '''
+
+        key = current_key()
+        with self.lock:
+            if key != self.key:
+                self.tree = self.fetch()
+                self.nodes = {
+                    (node.node_type, node.id): node
+                    for node in traverse(self.tree)
+                }
+                self.key = key
+            return self.tree
+
+    def read(self, build):
+        '''
+        Return `build` called with the tree of the current DB generation
+        while holding the lock, therefore no patch changes the tree
+        while it's being read.
+        '''
+        with self.lock:
+            return build(self.get())
+
+    @ensure_annotations
+    def apply(self, event: ChangeEvent) -> bool:
+        '''
+        Patch the tree with a committed change, return `False` if it
+        can't be applied and the tree will be fetched again instead.
+        '''
+
+        with self.lock:
+            if self.key != (db_base.DB_PATH, ) + event.before:
+                return False
+
+            try:
+                self._patch(event)
+            except (KeyError, ValueError):
+                # out of sync with the DB, fetch it again on next get()
+                self.key = None
+                return False
+            self.key = (db_base.DB_PATH, ) + event.after
+            return True
+
+    def _patch(self, event: ChangeEvent):
+        '''
+        Apply a change to the nodes, raise `KeyError` or `ValueError`
+        if the change does not fit the tree.
+        '''
+
+        values = event.values
+        if event.action == INSERT:
+            node = TreeNode(event.node_type, values)
+            parent_key = (
+                'parent_folder_id' if event.node_type == Folder
+                else 'folder_id'
+            )
+            _attach(self.nodes[(Folder, values[parent_key])], node)
+            self.nodes[(event.node_type, event.item_id)] = node
+            return
+
+        node = self.nodes[(event.node_type, event.item_id)]
+        if event.action == MOVE:
+            parent = self.nodes[(Folder, values['parent_id'])]
+            ancestor = parent
+            while ancestor is not None:
+                if ancestor is node:
+                    raise ValueError(f'Folder {node} contains a cycle')
+                ancestor = ancestor.parent
+
+            _detach(node)
+            if event.node_type == Folder:
+                node.parent_folder_id = parent.id
+            else:
+                node.folder_id = parent.id
+            _attach(parent, node)
+
+        elif event.action == RENAME:
+            if event.node_type == Folder:
+                node.folder_name = values['name']
+            else:
+                node.title = values['name']
+
+        elif event.action == URL_CHANGE and event.node_type == Bookmark:
+            node.url = values['url']
+
+        elif event.action == DELETE and not node.children:
+            _detach(node)
+            del self.nodes[(event.node_type, event.item_id)]
+
+        else:
+            raise ValueError(f'Unexpected {event}')
+
+
+# cache and tree shared by the whole process
+CACHE = TreeCache()
+HOLDER = TreeHolder()
@@ -3,14 +3,22 @@ Module for common functions.
 '''
 
 import json
-from anytree import Node, RenderTree, AsciiStyle
+from typing import Iterable
+
+from sqlalchemy import select, union_all, literal, null
 from ensure import ensure_annotations
 from frostmark.db import get_session
-from frostmark.models import Folder, Bookmark
+from frostmark.icons import data_uri
+from frostmark.models import Folder, Bookmark, Icon
+from frostmark.tree import TreeNode, traverse, render_tree
+
+# values of the `kind` column in select_tree_rows()
+FOLDER_ROW = 0
+BOOKMARK_ROW = 1
 
 
 @ensure_annotations
-def assemble_folder_tree(items: list, key: str, node_type) -> Node:
+def assemble_folder_tree(items: list, key: str, node_type) -> TreeNode:
     '''
     Assemble a folder tree, return a root node.
 
@@ -27,11 +35,7 @@ def assemble_folder_tree(items: list, key: str, node_type) -> Node:
 
     for item in items:
         assert 'parent' not in item, item
-        node = Node(
-            name=item['id'],
-            node_type=node_type,
-            **{k: v for k, v in item.items()}
-        )
+        node = TreeNode(node_type, item)
         nodes.append(node)
         parents[item['id']] = node
 
@@ -39,15 +43,15 @@ def assemble_folder_tree(items: list, key: str, node_type) -> Node:
         if node.parent_folder_id is None:
             root_node = node
             continue
-        node.parent = parents[getattr(node, key)]
+        parents[getattr(node, key)].add_child(node)
 
     return root_node
 
 
 @ensure_annotations
 def assemble_bookmark_tree(
-        items: list, key: str, folder_tree_root: Node, node_type
-) -> Node:
+        items: list, key: str, folder_tree_root: TreeNode, node_type
+) -> TreeNode:
     '''
     Assemble a folder tree, return a root node.
 
@@ -58,97 +62,225 @@ def assemble_bookmark_tree(
     to the children therefore removing a local ref won't cripple
     the tree and returning just the root node is fine.
     '''
-    nodes = []
-    folders = {}
+    folders = {node.id: node for node in traverse(folder_tree_root)}
 
-    def walk_tree(node):
-        folders[node.id] = node
+    for item in items:
+        assert 'parent' not in item, item
+        folders[item[key]].add_child(TreeNode(node_type, item))
 
-        if not node.children:
-            return
+    return folder_tree_root
 
-        for child in node.children:
-            walk_tree(child)
 
-    walk_tree(folder_tree_root)
+@ensure_annotations
+def assemble_record_tree(records: Iterable) -> TreeNode:
+    '''
+    Assemble a bookmark tree from ``(node_type, item)`` records in any order
+    as produced by the importers, return the root node.
 
-    for item in items:
-        assert 'parent' not in item, item
-        node = Node(
-            name=item['id'],
-            node_type=node_type,
-            **{k: v for k, v in item.items()}
-        )
+    Folder items use `parent_folder_id` and bookmark items use `folder_id`
+    key for the relationship, the root folder has `parent_folder_id` None.
+    '''
+    folders = []
+    bookmarks = []
+    for node_type, item in records:
+        if node_type == Folder:
+            folders.append(item)
+        elif node_type == Bookmark:
+            bookmarks.append(item)
+
+    return assemble_bookmark_tree(
+        items=bookmarks,
+        key='folder_id',
+        folder_tree_root=assemble_folder_tree(
+            items=folders,
+            key='parent_folder_id',
+            node_type=Folder
+        ),
+        node_type=Bookmark
+    )
+
+
+def select_tree_rows(bookmarks: bool = True, icons: bool = False):
+    '''
+    Return a single Core query of ``(kind, id, name, parent_id, url,
+    icon_hash, icon)`` rows with only the columns needed for a tree,
+    folders have `kind` `FOLDER_ROW` and name in `name`, bookmarks have
+    `kind` `BOOKMARK_ROW`, title in `name` and `folder_id` in `parent_id`.
+
+    The legacy inline `icon` bytes are selected only if `icons`
+    are requested, otherwise the column is NULL.
+    '''
+
+    folder = Folder.__table__  # pylint: disable=no-member
+    query = select([
+        literal(FOLDER_ROW).label('kind'),
+        folder.c.id,
+        folder.c.folder_name.label('name'),
+        folder.c.parent_folder_id.label('parent_id'),
+        null().label('url'),
+        null().label('icon_hash'),
+        null().label('icon')
+    ])
+    if not bookmarks:
+        return query
+
+    bookmark = Bookmark.__table__  # pylint: disable=no-member
+    return union_all(query, select([
+        literal(BOOKMARK_ROW),
+        bookmark.c.id,
+        bookmark.c.title,
+        bookmark.c.folder_id,
+        bookmark.c.url,
+        bookmark.c.icon_hash,
+        bookmark.c.icon if icons else null()
+    ]))
+
+
+def build_tree(rows: Iterable, store: dict = None) -> TreeNode:
+    '''
+    Build a tree from the `select_tree_rows` rows in any order in a single
+    pass, return the root node. Bookmark's `icon` is looked up by its
+    `icon_hash` in the `store` of encoded icons or is the inline icon.
+
+    Children are ordered as in `assemble_record_tree`, folders first
+    bookmarks second, each in the order of the rows.
+    '''
+
+    store = store or {}
+    root_id = Folder.get_root()[0]
+    folders = {}
+    nodes = []
+    for kind, item_id, name, parent_id, url, icon_hash, icon in rows:
+        if kind == FOLDER_ROW:
+            node = TreeNode(Folder, {
+                'id': item_id,
+                'folder_name': name,
+                # the root folder is its own parent in the internal DB
+                'parent_folder_id': (
+                    None if item_id == root_id else parent_id
+                )
+            })
+            folders[item_id] = node
+        else:
+            node = TreeNode(Bookmark, {
+                'id': item_id,
+                'title': name,
+                'url': url,
+                'folder_id': parent_id,
+                'icon_hash': icon_hash,
+                'icon': store.get(icon_hash) or icon or b''
+            })
         nodes.append(node)
 
+    # bookmarks can be attached only after all of the folders exist
+    root_node = None
     for node in nodes:
-        node.parent = folders[getattr(node, key)]
+        if node.node_type != Folder:
+            continue
+        if node.parent_folder_id is None:
+            root_node = node
+            continue
+        folders[node.parent_folder_id].add_child(node)
 
-    return folder_tree_root
+    for node in nodes:
+        if node.node_type == Bookmark:
+            folders[node.folder_id].add_child(node)
+    return root_node
 
 
 @ensure_annotations
-def fetch_folder_tree() -> Node:
+def fetch_folder_tree() -> TreeNode:
     '''
     Fetch folders only from the internal database, assemble a tree
-    and return the root Node.
+    and return the root node.
     '''
 
     session = get_session()
-    folders = [vars(item) for item in session.query(Folder).all()]
-    session.close()
+    try:
+        return build_tree(
+            session.execute(select_tree_rows(bookmarks=False)).fetchall()
+        )
+    finally:
+        session.close()
 
-    for folder in folders:
-        if folder['id'] != 0:
-            continue
-        folder['parent_folder_id'] = None
 
-    tree = assemble_folder_tree(
-        items=folders,
-        key='parent_folder_id',
-        node_type=Folder
-    )
-    return tree
+@ensure_annotations
+def fetch_icon(icon_hash: str):
+    '''
+    Fetch a single icon from the icon store by its hash,
+    return `None` if there is no such icon.
+    '''
+
+    session = get_session()
+    try:
+        return session.query(Icon).get(icon_hash)
+    finally:
+        session.close()
 
 
 @ensure_annotations
-def fetch_bookmark_tree() -> Node:
+def fetch_bookmark_tree(icons: bool = False) -> TreeNode:
     '''
     Fetch folders and bookmarks from the internal database, assemble
-    a bookmark tree and return the root Node
+    a bookmark tree and return the root node.
+
+    Only the needed columns are selected with a single query
+    (see `select_tree_rows`), no ORM instances are created.
+
+    Bookmark's `icon` is empty unless the `icons` are requested,
+    then it's a data URI or URL (bytes) usable as `img.src`.
     '''
 
     session = get_session()
-    folders = [vars(item) for item in session.query(Folder).all()]
-    bookmarks = [vars(item) for item in session.query(Bookmark).all()]
-    session.close()
-
-    for folder in folders:
-        if folder['id'] != 0:
-            continue
-        folder['parent_folder_id'] = None
+    try:
+        # each of the shared icons is encoded only once
+        store = {}
+        if icons:
+            store = {
+                icon_hash: data_uri(mime, data).encode('utf-8')
+                for icon_hash, mime, data in session.query(
+                    Icon.hash, Icon.mime, Icon.data
+                ).join(
+                    Bookmark, Bookmark.icon_hash == Icon.hash
+                ).distinct()
+            }
+        rows = session.execute(select_tree_rows(icons=icons)).fetchall()
+    finally:
+        session.close()
+    return build_tree(rows, store)
+
+
+def fetch_tree_snapshot():
+    '''
+    Fetch folders and bookmarks from the internal database as a columnar
+    `frostmark.snapshot.TreeSnapshot`, requires NumPy.
+    '''
+    from frostmark.snapshot import TreeSnapshot
 
-    tree = assemble_bookmark_tree(
-        items=bookmarks,
-        key='folder_id',
-        folder_tree_root=assemble_folder_tree(
-            items=folders,
-            key='parent_folder_id',
-            node_type=Folder
-        ),
-        node_type=Bookmark
+    session = get_session()
+    try:
+        folders = session.query(
+            Folder.id, Folder.folder_name, Folder.parent_folder_id
+        ).order_by(Folder.id).all()
+        bookmarks = session.query(
+            Bookmark.id, Bookmark.title, Bookmark.url, Bookmark.folder_id
+        ).order_by(Bookmark.id).all()
+    finally:
+        session.close()
+
+    return TreeSnapshot(
+        folders=folders, bookmarks=bookmarks, root_id=Folder.get_root()[0]
     )
-    return tree
 
 
 @ensure_annotations
-def print_bookmark_tree(root: Node):
+def print_bookmark_tree(root: TreeNode):
     '''
-    Print a nested bookmark tree from a root tree `Node`, folders first
+    Print a nested bookmark tree from a root tree node, folders first
     bookmark with urls second.
     '''
 
-    for pre, _, node in RenderTree(root, style=AsciiStyle()):
+    for pre, node in render_tree(root):
         if node.node_type == Folder:
             required = ('folder_name', )
             args = [getattr(node, key) for key in required]
@@ -163,21 +295,17 @@ def print_bookmark_tree(root: Node):
 
 
 @ensure_annotations
-def json_bookmark_tree(root: Node):
+def json_bookmark_tree(root: TreeNode):
     '''
-    Assemble a nested bookmark tree from a root tree `Node`, folders first
+    Assemble a nested bookmark tree from a root tree node, folders first
     bookmark with urls second and put it to JSON.
     '''
 
-    exclude = ['NodeMixin', 'sa_instance_state']
     output = []
     for item in traverse(root):
         obj = {}
-        for key, value in vars(item).items():
-            if any([exc in key for exc in exclude]):
-                continue
-
-            elif key == 'node_type':
+        for key, value in item.as_dict().items():
+            if key == 'node_type':
                 obj[key] = str(value.__name__)
 
             elif key == 'icon':
@@ -189,17 +317,3 @@ def json_bookmark_tree(root: Node):
         output.append(obj)
 
     return json.dumps(output)
-
-
-@ensure_annotations
-def traverse(root: Node) -> list:
-    '''
-    Traverse an anytree tree recursively from the root node down to the last
-    child and return a flat list of tree nodes.
-    '''
-
-    nodes = []
-    nodes.append(root)
-    for child in root.children:
-        nodes += traverse(child)
-    return nodes
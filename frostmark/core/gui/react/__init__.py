@@ -8,10 +8,11 @@ from os.path import join, dirname, abspath
 from tempfile import NamedTemporaryFile
 from flask import Flask, Response, request
 
+from frostmark.cache import CACHE, HOLDER
 from frostmark.licenses import Licenses
 from frostmark.common import (
-    fetch_bookmark_tree,
     fetch_folder_tree,
+    fetch_icon,
     json_bookmark_tree
 )
 from frostmark.editor import Editor
@@ -28,6 +29,12 @@ APP = Flask(
 )
 APP.debug = False
 
+# edits are patched into the tree instead of fetching it again
+Editor.subscribe(HOLDER.apply)
+
+# progress of the currently running import, see import_progress()
+IMPORT_PROGRESS = {}
+
 
 @APP.route('/')
 def index():
@@ -43,9 +50,13 @@ def index():
 def list_tree():
     """
     Return a flat list of a bookmark tree.
+
+    Icons are referenced only by their ``icon_hash``, see icon().
     """
     response = Response(
-        response=json_bookmark_tree(fetch_bookmark_tree()),
+        response=CACHE.get(
+            'list_tree', lambda: HOLDER.read(json_bookmark_tree)
+        ),
         headers={
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Headers': '*',
@@ -56,13 +67,55 @@ def list_tree():
     return response
 
 
+@APP.route('/api/icon/<icon_hash>')
+def icon(icon_hash):
+    """
+    Return a single icon from the icon store.
+
+    The hash is computed from the icon's content, therefore the icon
+    under the same URL never changes and can be cached forever.
+
+    Icons may be SVG from an imported profile, therefore scripts
+    and external resources are blocked if one is opened directly.
+    """
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': '*',
+        'Access-Control-Allow-Methods': '*',
+        'Content-Security-Policy': (
+            "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+        ),
+        'X-Content-Type-Options': 'nosniff'
+    }
+    cached = {
+        **headers,
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'ETag': f'"{icon_hash}"'
+    }
+
+    if request.if_none_match.contains(icon_hash):
+        return Response(status=304, headers=cached)
+
+    stored = fetch_icon(icon_hash)
+    if stored is None:
+        return Response(status=404, headers=headers)
+
+    return Response(
+        response=stored.data,
+        headers=cached,
+        mimetype=stored.mime
+    )
+
+
 @APP.route('/api/list_folders')
 def list_folders():
     """
     Return a flat list of a folder tree.
     """
     response = Response(
-        response=json_bookmark_tree(fetch_folder_tree()),
+        response=CACHE.get('list_folders', lambda: json_bookmark_tree(
+            fetch_folder_tree()
+        )),
         headers={
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Headers': '*',
@@ -119,7 +172,7 @@ def export_bookmarks():
     """
     Export all bookmarks as HTML.
     """
-    export = Exporter.prepare_export()
+    export = CACHE.get('export_bookmarks', Exporter.prepare_export)
     response = Response(
         response=export.encode('utf-8'),
         headers={
@@ -153,17 +206,32 @@ def list_profiles():
 @APP.route('/api/import_bookmarks', methods=['POST'])
 def import_bookmarks():
     """
-    Import bookmarks from file.
+    Import bookmarks from file, optionally labeled as a `profile`.
     """
     browser = request.form.get('browser')
     bookmarks = request.files.get('file')
+    profile = request.form.get('profile', '').strip()
     status = 302
 
     # only edit if all the fields are ok
     if all([item is not None for item in (browser, bookmarks)]):
+        importer = Importer(browser)
         with NamedTemporaryFile() as temp:
             temp.write(bookmarks.read())
-            Importer(browser).import_from(temp.name)
+            temp.flush()
+
+            # only a profile label identifies the uploads of the same
+            # profile (the file names are all the same), a repeated upload
+            # then updates the items and removes the missing ones
+            importer.import_from(
+                temp.name,
+                progress=lambda item: IMPORT_PROGRESS.update(item.as_dict()),
+                name=f'upload:{profile}' if profile else ''
+            )
+
+            # otherwise the items are only added, never removed
+            if not profile:
+                importer.forget_source(temp.name)
         status = 301
 
     response = Response(
@@ -179,6 +247,23 @@ def import_bookmarks():
     return response
 
 
+@APP.route('/api/import_progress')
+def import_progress():
+    """
+    Return the progress of the running (or the last) import.
+    """
+    response = Response(
+        response=json.dumps(IMPORT_PROGRESS),
+        headers={
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': '*',
+            'Access-Control-Allow-Methods': '*'
+        },
+        mimetype='application/json'
+    )
+    return response
+
+
 @APP.route('/api/all_licenses')
 def all_licenses():
     """
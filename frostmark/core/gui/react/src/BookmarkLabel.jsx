@@ -94,7 +94,7 @@ class BookmarkLabel extends Component {
 
     createIconLabel() {
         return <span><img
-            // data:image/png;base64,encodedstring
+            // /api/icon/<hash>, url or data:image/png;base64,encodedstring
             src={this.props.icon}
             alt={this.props.text}
         /> {this.props.text}</span>;
@@ -63,7 +63,9 @@ class BookmarkList extends Component {
                     url: item.url,
                     folder_id: item.folder_id,
                     node_type: item.node_type,
-                    icon: item.icon
+                    icon: item.icon_hash
+                        ? `/api/icon/${item.icon_hash}`
+                        : item.icon
                 };
             }
         });
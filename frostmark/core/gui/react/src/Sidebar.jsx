@@ -30,6 +30,18 @@ class Sidebar extends Component {
             <p className='bookmarkLabelParagraph'>
                 <input name='file' type='file' />
             </p>
+            <h4>Profile label (optional):</h4>
+            <p className='bookmarkLabelParagraph'>
+                <input
+                    name='profile'
+                    type='text'
+                    placeholder='e.g. work laptop'
+                    title={
+                        'Uploads with the same label update the same '
+                        + 'bookmarks, without a label they are only added'
+                    }
+                />
+            </p>
             <p className='bookmarkLabelParagraph'>
                 <input type='submit' value='Import' />
                 <button
@@ -2,7 +2,12 @@
 Module for creating SQLite DB schema and session retrieving.
 '''
 
-from frostmark.db_base import BASE, SESSIONMAKER, ENGINE
+from contextlib import contextmanager
+from uuid import uuid4
+
+from sqlalchemy import inspect
+
+from frostmark.db_base import BASE, SESSIONMAKER, get_engine
 
 
 def folder_check_root(session):
@@ -11,10 +16,12 @@ def folder_check_root(session):
     '''
     from frostmark.models import Folder
 
-    folders = session.query(Folder).all()
     root_folder = Folder.get_root()
+    exists = session.query(Folder.id).filter(
+        Folder.id == root_folder[0]
+    ).first()
 
-    if not any([fold.id == root_folder[0] for fold in folders]):
+    if not exists:
         session.add(Folder(
             id=root_folder[0],
             folder_name=root_folder[1],
@@ -23,12 +30,186 @@ def folder_check_root(session):
     session.commit()
 
 
-def get_session():
+def move_inline_icons(conn):
+    '''
+    Move the icons stored inline in bookmark rows as data URIs by an older
+    version into the icon store, other values (URLs) are kept as they are.
+    '''
+    from frostmark.icons import hash_icon, parse_data_uri
+
+    rows = conn.execute(
+        'SELECT id, icon FROM bookmark WHERE length(icon) > 0'
+    ).fetchall()
+    for bookmark_id, icon in rows:
+        parsed = parse_data_uri(bytes(icon).decode('utf-8', 'replace'))
+        if not parsed:
+            continue
+
+        mime, data = parsed
+        conn.execute(
+            'INSERT OR IGNORE INTO icon (hash, mime, data) VALUES (?, ?, ?)',
+            (hash_icon(data), mime, data)
+        )
+        conn.execute(
+            "UPDATE bookmark SET icon = X'', icon_hash = ? WHERE id = ?",
+            (hash_icon(data), bookmark_id)
+        )
+
+
+def add_missing_columns(conn):
+    '''
+    Add the columns missing in the tables created by an older version,
+    create_all() only creates the missing tables.
+
+    Only nullable columns without a default can be added this way which
+    is what the new columns have to look like. When the icon store
+    reference is added, the inline icons are moved to the store.
+    '''
+
+    inspector = inspect(conn)
+    for table in BASE.metadata.sorted_tables:
+        existing = {
+            column['name']
+            for column in inspector.get_columns(table.name)
+        }
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            conn.execute(
+                f'ALTER TABLE {table.name} ADD COLUMN {column.name} '
+                f'{column.type.compile(conn.dialect)}'
+            )
+            if (table.name, column.name) == ('bookmark', 'icon_hash'):
+                move_inline_icons(conn)
+
+
+def create_missing_indexes(conn):
+    '''
+    Create the indexes missing in the tables created by an older version,
+    create_all() creates the indexes only together with a new table.
+    '''
+
+    inspector = inspect(conn)
+    for table in BASE.metadata.sorted_tables:
+        existing = {
+            index['name'] for index in inspector.get_indexes(table.name)
+        }
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+
+
+def create_generation(conn):
+    '''
+    Insert the generation row and create the triggers incrementing it
+    on each change of the folders and bookmarks, including the writes
+    from other processes or tools, see `get_generation`.
+    '''
+
+    conn.execute(
+        'INSERT OR IGNORE INTO generation (id, token, value) '
+        'VALUES (0, ?, 0)', (uuid4().hex, )
+    )
+    for table in ('folder', 'bookmark'):
+        for action in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS '
+                f'{table}_{action.lower()}_generation '
+                f'AFTER {action} ON {table} BEGIN '
+                f'UPDATE generation SET value = value + 1 WHERE id = 0; '
+                f'END'
+            )
+
+
+# upgrades of the DB schema created by an older version, the index
+# of an upgrade + 1 is the schema version (PRAGMA user_version) after it,
+# each of them has to be idempotent, a new DB goes through all of them
+MIGRATIONS = (
+    add_missing_columns,
+    create_missing_indexes,
+    create_generation
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def upgrade(engine):
     '''
-    Create DB schema and return a new session.
+    Apply the upgrades the DB schema has not been through yet
+    and store the new schema version.
     '''
 
-    BASE.metadata.create_all(ENGINE)
-    session = SESSIONMAKER()
+    with engine.begin() as conn:
+        version = conn.execute('PRAGMA user_version').scalar()
+        if version >= SCHEMA_VERSION:
+            return
+
+        for migration in MIGRATIONS[version:]:
+            migration(conn)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def bootstrap(session):
+    '''
+    Create DB schema with the default rows and upgrade it, the schema
+    version is stored last as a mark of a complete bootstrap.
+    '''
+
+    engine = session.get_bind()
+    BASE.metadata.create_all(engine)
     folder_check_root(session)
+    upgrade(engine)
+
+
+def get_session():
+    '''
+    Return a new session, create DB schema first if it's not up to date.
+
+    Only the schema version is checked for an already bootstrapped DB,
+    therefore the cost does not depend on the amount of stored items.
+    '''
+
+    session = SESSIONMAKER(bind=get_engine())
+    if session.execute('PRAGMA user_version').scalar() < SCHEMA_VERSION:
+        bootstrap(session)
     return session
+
+
+def get_generation(session) -> tuple:
+    '''
+    Return ``(token, value)`` of the DB generation, it changes whenever
+    any folder or bookmark is written, therefore it's a cheap key
+    for the values built from the whole tree.
+    '''
+    return tuple(session.execute(
+        'SELECT token, value FROM generation WHERE id = 0'
+    ).first())
+
+
+def lock_generation(session) -> tuple:
+    '''
+    Start a write transaction in `session` and return the current DB
+    generation, no other writer can change it until the transaction ends.
+    '''
+
+    # a no-op write acquires the write lock, a plain read would not
+    # start the transaction at all
+    session.execute('UPDATE generation SET value = value WHERE id = 0')
+    return get_generation(session)
+
+
+@contextmanager
+def session_scope():
+    '''
+    Provide a session for a block of work, commit it at the end
+    or roll it back on an exception and close it in both cases.
+    '''
+
+    session = get_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
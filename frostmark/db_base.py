@@ -3,17 +3,145 @@ Module for creating a connection to SQLite DB
 and SQLAlchemy declarative base home.
 '''
 
+import re
+from os import environ
 from os.path import join, dirname, abspath
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from frostmark import user_data
 
 DB_NAME = 'user_db.sqlite'
-DB_PATH = join(dirname(abspath(user_data.__file__)), DB_NAME)
-ENGINE = create_engine(f'sqlite:///{DB_PATH}')
+DB_PATH = environ.get(
+    'FROSTMARK_DB', join(dirname(abspath(user_data.__file__)), DB_NAME)
+)
+
+# DB kept only in memory while the process is running
+MEMORY = ':memory:'
+
+# named in-memory DB shared by all connections in the process,
+# otherwise each connection would have its own empty DB
+MEMORY_URL = 'sqlite:///file:frostmark?mode=memory&cache=shared&uri=true'
+
+# connection keeping the in-memory DB alive between the sessions
+MEMORY_CONNECTION = None
+
+# engine of the DB at DB_PATH, created on the first use, see get_engine()
+_ENGINE = None
+
+# pragmas applied to each new connection, WAL journal lets the readers
+# (GUI) and a writer (import) work at the same time without blocking
+DB_PROFILES = {
+    # fast by default, the last commits might be lost on a power failure
+    # (never corrupted), the import of the same profile fixes that
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': '-65536',
+        'mmap_size': '268435456',
+        'temp_store': 'MEMORY',
+        'busy_timeout': '5000'
+    },
+    # each commit is on the disk before it returns
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': '-2000',
+        'mmap_size': '0',
+        'temp_store': 'DEFAULT',
+        'busy_timeout': '30000'
+    }
+}
+DB_PROFILE = 'fast'
+
+# allowed values of the pragmas, they can not be passed as parameters
+PRAGMA_VALUE = re.compile(r'-?\w+')
+
+
+def get_pragmas(env: dict) -> dict:
+    '''
+    Return the pragmas of a profile selected with ``FROSTMARK_DB_PROFILE``
+    in `env` overridden with ``FROSTMARK_DB_<PRAGMA>`` values.
+    '''
+
+    name = env.get('FROSTMARK_DB_PROFILE', DB_PROFILE)
+    if name not in DB_PROFILES:
+        raise Exception(
+            f'Unknown DB profile {name}, use one of: {sorted(DB_PROFILES)}'
+        )
+
+    pragmas = {}
+    for pragma, value in DB_PROFILES[name].items():
+        value = env.get(f'FROSTMARK_DB_{pragma.upper()}', value)
+        if not PRAGMA_VALUE.fullmatch(value):
+            raise Exception(f'Invalid value of {pragma} pragma: {value}')
+        pragmas[pragma] = value
+    return pragmas
+
+
+def set_pragmas(pragmas: dict):
+    '''
+    Return a listener for the engine's ``connect`` event
+    applying the `pragmas` to each new DBAPI connection.
+    '''
+
+    def listener(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma, value in pragmas.items():
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+        finally:
+            cursor.close()
+    return listener
+
+
+def create_db_engine(path: str):
+    '''
+    Create an engine for a DB file at `path` or for a DB in memory
+    shared by all of the sessions if `path` is ``:memory:``.
+    '''
+    # pylint: disable=global-statement
+
+    global MEMORY_CONNECTION
+    if path == MEMORY:
+        engine = create_engine(MEMORY_URL)
+    else:
+        engine = create_engine(f'sqlite:///{path}')
+    event.listen(engine, 'connect', set_pragmas(PRAGMAS))
+
+    if path == MEMORY and MEMORY_CONNECTION is None:
+        MEMORY_CONNECTION = engine.raw_connection()
+    return engine
+
+
+def get_engine():
+    '''
+    Return the engine of the DB at `DB_PATH` and bind the sessions to it,
+    it's created only on the first use (see `create_db_engine`).
+    '''
+    # pylint: disable=global-statement
+
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = create_db_engine(DB_PATH)
+        SESSIONMAKER.configure(bind=_ENGINE)
+    return _ENGINE
+
+
+def use_database(path: str):
+    '''
+    Point the engine and all of the new sessions to a different DB,
+    the engine is created again on the next use.
+    '''
+    # pylint: disable=global-statement
+
+    global DB_PATH, _ENGINE
+    DB_PATH = path
+    _ENGINE = None
+
+
+PRAGMAS = get_pragmas(environ)
 BASE = declarative_base()
 SESSIONMAKER = sessionmaker()
-SESSIONMAKER.configure(bind=ENGINE)
@@ -3,16 +3,76 @@ Edit imported bookmarks.
 '''
 from ensure import ensure_annotations
 
-from frostmark.db import get_session
-from frostmark.models import Folder, Bookmark
+from frostmark.db import session_scope, get_generation, lock_generation
+from frostmark.models import Folder, Bookmark, ImportItem
+from frostmark.editor.events import (
+    ChangeEvent, MOVE, RENAME, URL_CHANGE, INSERT, DELETE
+)
 
 
 class Editor:
     '''
     Class encapsuling methods for editing imported Bookmarks and Folders.
+
+    Each committed change is passed as `ChangeEvent` to the callbacks
+    registered with `subscribe`, e.g. to patch a tree kept in memory.
     '''
     # pylint: disable=too-few-public-methods
 
+    # callbacks receiving ChangeEvent after each change
+    listeners = []
+
+    @staticmethod
+    def subscribe(callback):
+        '''
+        Call `callback` with `ChangeEvent` after each committed change.
+        '''
+        if callback not in Editor.listeners:
+            Editor.listeners.append(callback)
+
+    @staticmethod
+    def unsubscribe(callback):
+        '''
+        Stop passing the change events to `callback`.
+        '''
+        if callback in Editor.listeners:
+            Editor.listeners.remove(callback)
+
+    @staticmethod
+    def _event(session, before: tuple, action: str, node_type,
+               item_id: int, values: dict) -> ChangeEvent:
+        '''
+        Create an event for a change in `session` made since the `before`
+        generation, the generation is read inside of the same transaction
+        after the change, therefore it's the one after the commit.
+        '''
+        # pylint: disable=too-many-arguments
+
+        session.flush()
+        return ChangeEvent(
+            action=action, node_type=node_type, item_id=item_id,
+            values=values, before=before, after=get_generation(session)
+        )
+
+    @staticmethod
+    def _emit(event: ChangeEvent):
+        '''
+        Pass a committed change to all of the listeners.
+        '''
+        for callback in list(Editor.listeners):
+            callback(event)
+
+    @staticmethod
+    def _forget(session, node_type, item_id: int):
+        '''
+        Delete the import mapping of a removed item, therefore
+        a re-import of its source adds the item again as new.
+        '''
+        session.query(ImportItem).filter(
+            ImportItem.kind == node_type.__tablename__,
+            ImportItem.item_id == item_id
+        ).delete(synchronize_session=False)
+
     @staticmethod
     @ensure_annotations
     def change_parent_folder(folder_id: int, parent_id: int):
@@ -24,8 +84,8 @@ class Editor:
         if folder_id == parent_id:
             raise Exception('Folder can not be its own parent')
 
-        session = get_session()
-        try:
+        with session_scope() as session:
+            before = lock_generation(session)
             child = session.query(Folder).filter(
                 Folder.id == folder_id
             ).first()
@@ -39,10 +99,11 @@ class Editor:
                 )
 
             child.parent_folder_id = parent.id
-            session.commit()
-
-        finally:
-            session.close()
+            event = Editor._event(
+                session, before, MOVE, Folder, folder_id,
+                {'parent_id': parent_id}
+            )
+        Editor._emit(event)
 
     @staticmethod
     @ensure_annotations
@@ -55,8 +116,8 @@ class Editor:
         if bookmark_id == parent_id:
             raise Exception('Bookmark can not be its own parent')
 
-        session = get_session()
-        try:
+        with session_scope() as session:
+            before = lock_generation(session)
             child = session.query(Bookmark).filter(
                 Bookmark.id == bookmark_id
             ).first()
@@ -70,10 +131,11 @@ class Editor:
                 )
 
             child.folder_id = parent.id
-            session.commit()
-
-        finally:
-            session.close()
+            event = Editor._event(
+                session, before, MOVE, Bookmark, bookmark_id,
+                {'parent_id': parent_id}
+            )
+        Editor._emit(event)
 
     @staticmethod
     @ensure_annotations
@@ -82,17 +144,17 @@ class Editor:
         Change folder's name.
         '''
 
-        session = get_session()
-        try:
+        with session_scope() as session:
+            before = lock_generation(session)
             child = session.query(Folder).filter(
                 Folder.id == folder_id
             ).first()
 
             child.folder_name = name
-            session.commit()
-
-        finally:
-            session.close()
+            event = Editor._event(
+                session, before, RENAME, Folder, folder_id, {'name': name}
+            )
+        Editor._emit(event)
 
     @staticmethod
     @ensure_annotations
@@ -101,17 +163,18 @@ class Editor:
         Change bookmark's title.
         '''
 
-        session = get_session()
-        try:
+        with session_scope() as session:
+            before = lock_generation(session)
             child = session.query(Bookmark).filter(
                 Bookmark.id == bookmark_id
             ).first()
 
             child.title = name
-            session.commit()
-
-        finally:
-            session.close()
+            event = Editor._event(
+                session, before, RENAME, Bookmark, bookmark_id,
+                {'name': name}
+            )
+        Editor._emit(event)
 
     @staticmethod
     @ensure_annotations
@@ -120,14 +183,125 @@ class Editor:
         Change bookmark's title.
         '''
 
-        session = get_session()
-        try:
+        with session_scope() as session:
+            before = lock_generation(session)
             child = session.query(Bookmark).filter(
                 Bookmark.id == bookmark_id
             ).first()
 
             child.url = url
-            session.commit()
+            event = Editor._event(
+                session, before, URL_CHANGE, Bookmark, bookmark_id,
+                {'url': url}
+            )
+        Editor._emit(event)
+
+    @staticmethod
+    @ensure_annotations
+    def add_folder(parent_id: int, name: str) -> int:
+        '''
+        Create a new folder in an existing parent folder, return its ID.
+        '''
+
+        with session_scope() as session:
+            before = lock_generation(session)
+            if not session.query(Folder.id).filter(
+                    Folder.id == parent_id
+            ).first():
+                raise Exception(f'Parent: {parent_id} does not exist')
+
+            child = Folder(folder_name=name, parent_folder_id=parent_id)
+            session.add(child)
+            session.flush()
+            event = Editor._event(
+                session, before, INSERT, Folder, child.id, {
+                    'id': child.id,
+                    'folder_name': name,
+                    'parent_folder_id': parent_id
+                }
+            )
+        Editor._emit(event)
+        return event.item_id
+
+    @staticmethod
+    @ensure_annotations
+    def add_bookmark(parent_id: int, name: str, url: str) -> int:
+        '''
+        Create a new bookmark in an existing folder, return its ID.
+        '''
+
+        with session_scope() as session:
+            before = lock_generation(session)
+            if not session.query(Folder.id).filter(
+                    Folder.id == parent_id
+            ).first():
+                raise Exception(f'Parent: {parent_id} does not exist')
+
+            child = Bookmark(title=name, url=url, folder_id=parent_id)
+            session.add(child)
+            session.flush()
+            event = Editor._event(
+                session, before, INSERT, Bookmark, child.id, {
+                    'id': child.id,
+                    'title': name,
+                    'url': url,
+                    'folder_id': parent_id,
+                    'icon_hash': None,
+                    'icon': b''
+                }
+            )
+        Editor._emit(event)
+        return event.item_id
+
+    @staticmethod
+    @ensure_annotations
+    def remove_folder(folder_id: int):
+        '''
+        Remove an empty folder other than the root folder.
+        '''
+
+        if folder_id == Folder.get_root()[0]:
+            raise Exception('Root folder can not be removed')
+
+        with session_scope() as session:
+            before = lock_generation(session)
+            child = session.query(Folder).filter(
+                Folder.id == folder_id
+            ).first()
+            if not child:
+                raise Exception(f'Folder: {folder_id} does not exist')
+
+            if session.query(Folder.id).filter(
+                    Folder.parent_folder_id == folder_id
+            ).first() or session.query(Bookmark.id).filter(
+                Bookmark.folder_id == folder_id
+            ).first():
+                raise Exception(f'Folder: {child} is not empty')
+
+            session.delete(child)
+            Editor._forget(session, Folder, folder_id)
+            event = Editor._event(
+                session, before, DELETE, Folder, folder_id, {}
+            )
+        Editor._emit(event)
+
+    @staticmethod
+    @ensure_annotations
+    def remove_bookmark(bookmark_id: int):
+        '''
+        Remove a bookmark.
+        '''
+
+        with session_scope() as session:
+            before = lock_generation(session)
+            deleted = session.query(Bookmark).filter(
+                Bookmark.id == bookmark_id
+            ).delete()
+            if not deleted:
+                raise Exception(f'Bookmark: {bookmark_id} does not exist')
 
-        finally:
-            session.close()
+            Editor._forget(session, Bookmark, bookmark_id)
+            event = Editor._event(
+                session, before, DELETE, Bookmark, bookmark_id, {}
+            )
+        Editor._emit(event)
@@ -0,0 +1,55 @@
+'''
+Module for the change events emitted by the editor.
+'''
+
+from ensure import ensure_annotations
+
+# values of ChangeEvent.action
+MOVE = 'move'
+RENAME = 'rename'
+URL_CHANGE = 'url-change'
+INSERT = 'insert'
+DELETE = 'delete'
+
+
+class ChangeEvent:
+    '''
+    A single committed change of a folder or a bookmark:
+
+    * ``action`` - one of `MOVE`, `RENAME`, `URL_CHANGE`, `INSERT`
+      or `DELETE`
+    * ``node_type`` - `Folder` or `Bookmark` model
+    * ``item_id`` - ID of the changed item
+    * ``values`` - new values, ``parent_id`` for a move, ``name``
+      for a rename, ``url`` for a URL change or the whole item
+      for an insert (empty for a delete)
+    * ``before``, ``after`` - DB generation before and after the change
+      (see `frostmark.db.get_generation`)
+    '''
+    # pylint: disable=too-few-public-methods,too-many-arguments
+
+    __slots__ = (
+        'action', 'node_type', 'item_id', 'values', 'before', 'after'
+    )
+
+    @ensure_annotations
+    def __init__(
+            self, action: str, node_type, item_id: int, values: dict,
+            before: tuple, after: tuple
+    ):
+        self.action = action
+        self.node_type = node_type
+        self.item_id = item_id
+        self.values = values
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return (
+            "<ChangeEvent("
+            "action='%s', node_type=%s, item_id=%s, values=%s"
+            ")>" % (
+                self.action, getattr(self.node_type, '__name__', None),
+                self.item_id, self.values
+            )
+        )
@@ -53,7 +53,9 @@ class Exporter:
         ''')
         xml = xml[1:]  # strip first \n character
 
-        tree = traverse(fetch_bookmark_tree())
+        # loads the icons on purpose, the export embeds them as ICON
+        # attributes unlike the other readers of the tree
+        tree = traverse(fetch_bookmark_tree(icons=True))
         tree_len = len(tree)
         sep = ' ' * 4
         folder_stack = []
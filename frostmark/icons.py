@@ -0,0 +1,130 @@
+'''
+Module for handling bookmark icons (favicons) stored by their content.
+'''
+
+from base64 import b64encode, b64decode
+from binascii import Error as Base64Error
+from hashlib import sha256
+from io import BytesIO
+from urllib.parse import unquote_to_bytes
+
+from ensure import ensure_annotations
+
+try:
+    from PIL import Image
+except ImportError:
+    # optional, only for normalize_icon()
+    Image = None
+
+# leading bytes of the image formats used for favicons
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\x00\x00\x01\x00', 'image/x-icon'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'BM', 'image/bmp')
+)
+
+# canonical sizes (in pixels) of the normalized icons
+ICON_SIZES = (16, 32)
+
+
+@ensure_annotations
+def sniff_mime(data: bytes) -> str:
+    '''
+    Guess MIME type of an icon from its content, browsers usually
+    store only the raw bytes without the type.
+    '''
+
+    for signature, mime in SIGNATURES:
+        if data.startswith(signature):
+            return mime
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+
+    if b'<svg' in data[:512]:
+        return 'image/svg+xml'
+    return 'application/octet-stream'
+
+
+@ensure_annotations
+def hash_icon(data: bytes) -> str:
+    '''
+    Return the key of an icon in the icon store (SHA-256 hex digest).
+    '''
+    return sha256(data).hexdigest()
+
+
+@ensure_annotations
+def data_uri(mime: str, data: bytes) -> str:
+    '''
+    Encode an icon as a data URI usable directly as `img.src`.
+    '''
+    return f'data:{mime};base64,{b64encode(data).decode("ascii")}'
+
+
+@ensure_annotations
+def parse_data_uri(uri: str) -> tuple:
+    '''
+    Decode a data URI into ``(mime, data)``, return an empty tuple
+    if `uri` is not a valid data URI (e.g. a plain URL).
+    '''
+
+    if not uri.startswith('data:') or ',' not in uri:
+        return ()
+
+    header, payload = uri[len('data:'):].split(',', 1)
+    params = header.split(';')
+    try:
+        if params[-1] == 'base64':
+            data = b64decode(payload, validate=True)
+        else:
+            data = unquote_to_bytes(payload)
+    except Base64Error:
+        return ()
+    return (params[0] or 'text/plain', data)
+
+
+@ensure_annotations
+def require_pillow():
+    '''
+    Raise an exception if Pillow needed for `normalize_icon` is missing.
+    '''
+    if Image is None:
+        raise Exception(
+            'Pillow is required for normalizing icons, '
+            'install frostmark[icons]'
+        )
+
+
+def normalize_icon(data: bytes) -> tuple:
+    '''
+    Decode an icon, downscale it to the smallest size from `ICON_SIZES`
+    it fits in (or the largest one) and re-encode it as PNG.
+
+    Return ``(mime, data)`` or an empty tuple if the icon can't be decoded
+    by Pillow (e.g. SVG) or is already small enough and not any smaller
+    after re-encoding, then the original should be kept.
+    '''
+    # not wrapped by ensure_annotations to be picklable for a process pool
+
+    require_pillow()
+    try:
+        with Image.open(BytesIO(data)) as image:
+            side = max(image.size)
+            target = min(
+                (size for size in ICON_SIZES if size >= side),
+                default=max(ICON_SIZES)
+            )
+            image = image.convert('RGBA')
+            image.thumbnail((target, target), Image.LANCZOS)
+            output = BytesIO()
+            image.save(output, format='PNG', optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return ()
+
+    if side <= target and len(output.getvalue()) >= len(data):
+        return ()
+    return ('image/png', output.getvalue())
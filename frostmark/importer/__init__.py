@@ -1,20 +1,38 @@
 '''
 Import bookmarks from various bookmarks database files into internal database.
 '''
+# pylint: disable=too-many-lines
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from itertools import islice
+from os import stat
+from os.path import abspath
+from typing import Iterable, Callable
+
 from ensure import ensure_annotations
 
-from sqlalchemy import (
-    create_engine, Column, Integer, String
-)
+from sqlalchemy import create_engine, func, select, and_, bindparam
 from sqlalchemy.orm.session import sessionmaker, Session
 from sqlalchemy.ext.declarative.api import DeclarativeMeta as MetaBase
+from sqlalchemy.sql.base import Executable
 
-from frostmark.db import get_session
-from frostmark.common import traverse
-from frostmark.models import Folder, Bookmark
+from frostmark.db import get_session, lock_generation
+from frostmark.icons import require_pillow, normalize_icon
+from frostmark.models import (
+    Folder, Bookmark, Icon, ImportSource, ImportItem
+)
 from frostmark.importer.firefox import FirefoxImporter
+from frostmark.importer.chromium import ChromiumImporter
 from frostmark.importer.opera import OperaImporter
 from frostmark.importer.chrome import ChromeImporter
+from frostmark.importer.progress import ImportProgress, print_progress
+
+# default number of rows sent to the database in a single executemany() call
+CHUNK_SIZE = 1000
+
+# number of bytes read at once while computing the digest of a file
+HASH_CHUNK_SIZE = 1024 * 1024
 
 
 class Importer:
@@ -25,7 +43,20 @@ class Importer:
     # pylint: disable=too-few-public-methods
 
     @ensure_annotations
-    def __init__(self, backend: str):
+    def __init__(
+            self, backend: str, chunk_size: int = CHUNK_SIZE,
+            stream: bool = False, normalize_icons: bool = False
+    ):
+        self.name = backend
+        self.chunk_size = chunk_size
+
+        # parse JSON files incrementally, slower, but bounded memory
+        self.stream = stream
+
+        # downscale and re-encode the imported icons, requires Pillow
+        if normalize_icons:
+            require_pillow()
+        self.normalize_icons = normalize_icons
         self.backend = None
         if backend == 'firefox':
             self.backend = FirefoxImporter()
@@ -33,6 +64,8 @@ class Importer:
             self.backend = OperaImporter()
         elif backend == 'chrome':
             self.backend = ChromeImporter()
+        elif backend == 'chromium':
+            self.backend = ChromiumImporter()
 
     @staticmethod
     @ensure_annotations
@@ -47,109 +80,976 @@ class Importer:
         session = maker()
         return session
 
+    @staticmethod
     @ensure_annotations
-    def import_from(self, path: str):
+    def _sort_folders(folders: list, known: dict = None) -> list:
         '''
-        Import bookmarks from particular path into internal storage.
+        Sort folder items topologically so that each parent comes before
+        its children, in a single breadth-first pass.
+
+        Sorting by parent ID is not enough because the ID of a child might
+        be smaller than ID of a parent which might be caused by browser
+        importing old bookmarks from database directly or from a different
+        browser while incorrectly setting IDs (or better said re-using
+        already existing IDs when possible).
+
+        Folders without a parent (`None` or `0`) are the top-level ones
+        and end up in the internal root folder, the same applies to folders
+        with parent in `known` (already imported) folders.
         '''
-        # pylint: disable=too-many-locals
 
-        backend = self.backend
+        known = known or {}
+        children = defaultdict(list)
+        queue = deque()
+        for folder in folders:
+            parent = folder['parent_folder_id']
+            if parent and parent not in known:
+                children[parent].append(folder)
+            else:
+                queue.append(folder)
+
+        result = []
+        while queue:
+            folder = queue.popleft()
+            result.append(folder)
+            queue.extend(children.pop(folder['id'], []))
+
+        # whatever is left has a parent which is not in the tree,
+        # the browser DB is just broken (dangling children)
+        if children:
+            raise Exception(
+                f'Missing parent folders: {sorted(children.keys())}'
+            )
+        return result
+
+    @staticmethod
+    @ensure_annotations
+    def _execute_chunked(
+            session: Session, statement: Executable, columns: tuple,
+            rows: Iterable, chunk_size: int, after_chunk=None
+    ):
+        '''
+        Execute `statement` for `rows` (tuples of values for `columns`)
+        with executemany() in chunks of `chunk_size` rows and call
+        `after_chunk` with the size of each chunk after it's executed.
+
+        The rows are consumed lazily, therefore only a single chunk is held
+        in memory at a time and no ORM objects (or identity map entries) are
+        created for the affected rows.
+        '''
+        # pylint: disable=too-many-arguments
+
+        rows = iter(rows)
+        while True:
+            chunk = [
+                dict(zip(columns, row))
+                for row in islice(rows, chunk_size)
+            ]
+            if not chunk:
+                break
+            session.execute(statement, chunk)
+            if after_chunk:
+                after_chunk(len(chunk))
+
+    @staticmethod
+    @ensure_annotations
+    def _next_id(session: Session, model: MetaBase) -> int:
+        '''
+        Return the first free ID after the current maximum so that the rows
+        can be inserted in bulk with pre-assigned IDs without flush()
+        after each row just to find out the new ID.
+
+        The write transaction is started first, therefore no other writer
+        can take the IDs until the rows are committed.
+        '''
+        lock_generation(session)
+        return (session.query(func.max(model.id)).scalar() or 0) + 1
+
+    @ensure_annotations
+    def _chunk_ids(self, session: Session, model: MetaBase, items: list):
+        '''
+        Yield ``(new ID, item)`` pairs, the IDs of each chunk of
+        `chunk_size` items are assigned only once the previous chunk
+        is committed (see `_next_id`).
+        '''
+
+        items = iter(items)
+        for chunk in iter(lambda: list(islice(items, self.chunk_size)), []):
+            yield from enumerate(chunk, start=self._next_id(session, model))
+
+    @ensure_annotations
+    def _insert_folders(
+            self, session: Session, folders: list, known: dict = None,
+            checkpoint: Callable = None
+    ) -> dict:
+        '''
+        Insert new folder items into internal DB, return a dictionary
+        of the original IDs pointing to the new ones.
+
+        Parent folders not in `folders` are looked up in `known`
+        (original ID pointing to an already imported internal ID).
+
+        `checkpoint` is called with a list of ``(original ID, new ID)``
+        pairs after each inserted chunk, parents always come first.
+        '''
+
+        known = known or {}
+        new_ids = {}
+        pending = []
+
+        def rows():
+            for new_id, folder in self._chunk_ids(
+                    session, Folder, self._sort_folders(folders, known)
+            ):
+                # preserve the original ID and point to the new one
+                new_ids[folder['id']] = new_id
+                pending.append((folder['id'], new_id))
+                parent = folder['parent_folder_id']
+                yield (
+                    new_id,
+                    folder['folder_name'],
+
+                    # otherwise default to internal root folder
+                    Folder.get_root()[0] if not parent
+                    else new_ids[parent] if parent in new_ids
+                    else known[parent]
+                )
+
+        self._execute_chunked(
+            session=session,
+            statement=Folder.__table__.insert(),  # pylint: disable=no-member
+            columns=('id', 'folder_name', 'parent_folder_id'),
+            rows=rows(),
+            chunk_size=self.chunk_size,
+            after_chunk=lambda _: self._release(pending, checkpoint)
+        )
+        return new_ids
+
+    @ensure_annotations
+    def _insert_bookmarks(
+            self, session: Session, bookmarks: list, folder_ids: dict,
+            checkpoint: Callable = None
+    ) -> dict:
+        '''
+        Insert new bookmark items into internal DB, return a dictionary
+        of the original IDs pointing to the new ones.
+
+        `folder_ids` maps the original folder IDs to internal ones,
+        for `checkpoint` see `_insert_folders`.
+        '''
+
+        new_ids = {}
+        pending = []
+
+        def rows():
+            for new_id, book in self._chunk_ids(
+                    session, Bookmark,
+                    sorted(bookmarks, key=lambda item: item['id'])
+            ):
+                new_ids[book['id']] = new_id
+                pending.append((book['id'], new_id))
+                yield (
+                    new_id, book['title'], book['url'], b'',
+                    folder_ids[book['folder_id']], book.get('icon_hash')
+                )
+
+        # no need for ORM objects, nothing requires
+        # a bookmark object to be present before final commit()
+        self._execute_chunked(
+            session=session,
+            statement=Bookmark.__table__.insert(),  # pylint: disable=no-member
+            columns=('id', 'title', 'url', 'icon', 'folder_id', 'icon_hash'),
+            rows=rows(),
+            chunk_size=self.chunk_size,
+            after_chunk=lambda _: self._release(pending, checkpoint)
+        )
+        return new_ids
+
+    @staticmethod
+    def _release(pending: list, checkpoint: Callable = None):
+        '''
+        Pass the pairs of IDs of the last inserted chunk to `checkpoint`.
+        '''
+        if checkpoint:
+            checkpoint(pending[:])
+        pending.clear()
+
+    @ensure_annotations
+    def import_from(
+            self, path: str, force: bool = False, progress=None,
+            name: str = ''
+    ) -> bool:
+        '''
+        Import bookmarks from particular path into internal storage,
+        return `False` if the file was skipped as unchanged.
+
+        The file is remembered as `ImportSource` and each imported item
+        is mapped to its internal ID with `ImportItem` by its native GUID,
+        therefore a repeated import of the same file only inserts the new
+        items, updates the changed ones and removes the deleted ones.
+
+        A file with the same size and mtime or content digest as during
+        the last import is not parsed at all unless `force` is used.
+        Firefox profiles additionally keep a watermark of the latest change
+        so that only the rows changed since the last import are read.
 
-        # get the bookmarks tree from file
+        The items are committed in chunks together with their mapping,
+        therefore an interrupted import continues where it stopped next
+        time. `progress` is called with `ImportProgress` after each chunk.
+
+        The source is remembered by its absolute path unless another stable
+        `name` is given, e.g. for a temporary copy of an uploaded file.
+        '''
+        return self.import_many(
+            paths=[path], jobs=1, force=force, progress=progress,
+            names=[name]
+        )[0]
+
+    @ensure_annotations
+    def import_many(
+            self, paths: list, jobs: int = 0, force: bool = False,
+            progress=None, names=None
+    ) -> list:
+        '''
+        Import bookmarks from multiple paths into internal storage,
+        return a list of flags whether each of the files was imported
+        or skipped as unchanged (see `import_from`).
+
+        The files are parsed in a pool of `jobs` processes (``0`` for one
+        per CPU core) while the parsed records are written in the current
+        process one file after another in the order of `paths`, therefore
+        there is always only a single writer for the internal DB.
+
+        With `normalize_icons` the new icons are processed in another pool
+        of `jobs` processes while being written.
+
+        `names` of the sources replace the paths (see `import_from`).
+        '''
+
+        names = dict(zip(paths, names or []))
+        frost = get_session()
+        try:
+            sources = [
+                self._get_source(
+                    session=frost, path=path, name=names.get(path, '')
+                )
+                for path in paths
+            ]
+            frost.commit()
+            cached = [
+                (
+                    source.size, source.mtime,
+                    source.digest or '', source.watermark
+                )
+                if not force else (None, None, '', 0)
+                for source in sources
+            ]
+        finally:
+            frost.close()
+
+        # cheap check without even opening the file
+        todo = [
+            (path, digest, watermark)
+            for path, (size, mtime, digest, watermark) in zip(paths, cached)
+            if (size, mtime) != self.stat(path)
+        ]
+
+        icon_pool = None
+        if self.normalize_icons and todo:
+            icon_pool = ProcessPoolExecutor(max_workers=jobs or None)
+
+        try:
+            if jobs == 1 or len(todo) <= 1:
+                results = (
+                    self.read(
+                        path=path, digest=digest, since=watermark, lazy=True
+                    )
+                    for path, digest, watermark in todo
+                )
+                imported = {
+                    path: self._write(
+                        path=path, result=result, progress=progress,
+                        icon_pool=icon_pool, name=names.get(path, '')
+                    )
+                    for (path, _, _), result in zip(todo, results)
+                }
+                return [imported.get(path, False) for path in paths]
+
+            with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+                futures = [
+                    # only the importer and the path are sent to the worker
+                    pool.submit(
+                        self.read, path=path, digest=digest, since=watermark
+                    )
+                    for path, digest, watermark in todo
+                ]
+                imported = {
+                    path: self._write(
+                        path=path, result=future.result(),
+                        progress=progress, icon_pool=icon_pool,
+                        name=names.get(path, '')
+                    )
+                    for (path, _, _), future in zip(todo, futures)
+                }
+            return [imported.get(path, False) for path in paths]
+        finally:
+            if icon_pool:
+                icon_pool.shutdown()
+
+    @staticmethod
+    @ensure_annotations
+    def stat(path: str) -> tuple:
+        '''
+        Return the size and mtime (in nanoseconds) of a file.
+        '''
+        result = stat(path)
+        return (result.st_size, result.st_mtime_ns)
+
+    @staticmethod
+    @ensure_annotations
+    def identity(path: str) -> tuple:
+        '''
+        Return the inode, size and mtime (in nanoseconds) of a file,
+        browsers replace the files by renaming a new one over them.
+        '''
+        result = stat(path)
+        return (result.st_ino, result.st_size, result.st_mtime_ns)
+
+    @staticmethod
+    @ensure_annotations
+    def _check_identity(path: str, identity: tuple):
+        '''
+        Raise an exception if the file is not the one read so far.
+        '''
+        if Importer.identity(path) != identity:
+            raise Exception(
+                f'{path} was changed during the import, import it again'
+            )
+
+    @staticmethod
+    @ensure_annotations
+    def _checked(path: str, identity: tuple, read: Callable) -> Callable:
+        '''
+        Wrap `read` producing items from a file so that each pass over
+        the file is checked to read the same file as the digest was
+        computed from, the passes then can't mix different versions.
+
+        The check before and after a pass means the file opened
+        in between is the same one.
+        '''
+
+        def wrapped(*args, **kwargs):
+            Importer._check_identity(path, identity)
+            yield from read(*args, **kwargs)
+            Importer._check_identity(path, identity)
+        return wrapped
+
+    @staticmethod
+    @ensure_annotations
+    def hash_file(path: str) -> str:
+        '''
+        Return SHA-256 hex digest of a file read in chunks.
+        '''
+        digest = sha256()
+        with open(path, 'rb') as fsource:
+            for chunk in iter(lambda: fsource.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @ensure_annotations
+    def read(
+            self, path: str, digest: str = '', since: int = 0,
+            lazy: bool = False
+    ) -> tuple:
+        '''
+        Parse a file without touching the internal DB, return a tuple of
+        the file's ``(size, mtime, digest)``, the new watermark and changes
+        since `since` watermark as a dictionary of:
+
+        * ``folders`` - list of changed folder items
+        * ``folder_guids`` - native IDs of all folders pointing to GUIDs
+        * ``bookmarks`` - ``(node_type, item)`` records of the changed
+          bookmarks and the icons they use (see `Icon`)
+        * ``bookmark_guids`` - GUIDs of all bookmarks, complete only
+          after ``bookmarks`` are consumed
+        * ``total`` - count of the changed folders and bookmarks
+
+        The changes are `None` if the content `digest` of the file
+        or the watermark has not changed since the last import.
+
+        With `lazy` the bookmarks are generated while reading the file
+        again (see `_pipeline`), otherwise everything is collected into
+        lists to be sent from a worker process.
+        '''
+
+        identity = self.identity(path)
+        stamp = identity[1:] + (self.hash_file(path), )
+        self._check_identity(path, identity)
+        if digest and stamp[2] == digest:
+            return (stamp, since, None)
+
+        backend = self.backend
         if isinstance(backend, FirefoxImporter):
-            source = self._path_session(path=path, base=backend.BASE)
-        elif isinstance(backend, OperaImporter):
-            source = path
-        elif isinstance(backend, ChromeImporter):
-            source = path
-        tree = backend.assemble_import_tree(source)
-
-        # open internal DB
-        nodes = traverse(tree)
-        folders = {
-            node.id: node
-            for node in nodes
-            if node.node_type == Folder
-        }
-        bookmarks = {
-            node.id: node
-            for node in nodes
-            if node.node_type == Bookmark
+            watermark = backend.get_watermark(path)
+            if since and watermark == since:
+                # nothing has changed since the last import
+                return (stamp, watermark, None)
+            changes = self._pipeline(
+                records=self._checked(
+                    path, identity, lambda icons: backend.iter_records(
+                        path, since=since, icons=icons
+                    )
+                ),
+                natives=self._checked(
+                    path, identity, lambda: backend.iter_native_ids(path)
+                )
+            )
+        else:
+            # no change tracking in the file, read all of it
+            watermark = 0
+            changes = self._pipeline(
+                records=self._checked(
+                    path, identity, lambda icons: backend.iter_records(
+                        path, stream=self.stream
+                    )
+                )
+            )
+
+        if not lazy:
+            changes['bookmarks'] = list(changes['bookmarks'])
+            changes['bookmark_guids'] = list(changes['bookmark_guids'])
+        return (stamp, watermark, changes)
+
+    @staticmethod
+    def _pipeline(records, natives=None) -> dict:
+        '''
+        Split the ``(node_type, item)`` records produced by `records(icons)`
+        into changes for `_apply_changes` (see `read`) in two passes.
+
+        The first pass keeps only the folders which are needed at once
+        to resolve the parents, the bookmarks are only counted. The second
+        pass generates the bookmarks (and their icons if the backend
+        supports them) lazily, therefore they are never held in memory
+        all at once.
+
+        `natives()` produces ``(node_type, id, guid)`` of all items
+        in the file if `records()` does not produce all of them.
+        '''
+
+        folders = []
+        total = 0
+        for node_type, item in records(icons=False):
+            if node_type == Folder:
+                folders.append(item)
+            total += node_type in (Folder, Bookmark)
+
+        if natives:
+            folder_guids = {}
+            for node_type, native_id, guid in natives():
+                if node_type == Folder:
+                    folder_guids[native_id] = guid
+            bookmark_guids = (
+                guid for node_type, _, guid in natives()
+                if node_type == Bookmark
+            )
+        else:
+            folder_guids = {item['id']: item['guid'] for item in folders}
+            bookmark_guids = set()
+
+        def bookmarks():
+            for node_type, item in records(icons=True):
+                if node_type == Folder:
+                    continue
+                if node_type == Bookmark and not natives:
+                    bookmark_guids.add(item['guid'])
+                yield (node_type, item)
+
+        return {
+            'folders': folders,
+            'folder_guids': folder_guids,
+            'bookmarks': bookmarks(),
+            'bookmark_guids': bookmark_guids,
+            'total': total
         }
 
-        # sqla objects
+    @ensure_annotations
+    def _write(
+            self, path: str, result: tuple, progress=None, icon_pool=None,
+            name: str = ''
+    ) -> bool:
+        '''
+        Apply the `result` of `read` for a file to the internal DB,
+        return `False` if there was nothing to apply.
+
+        The new icons are normalized in `icon_pool` if specified.
+
+        The file's stamp and watermark are stored only after all of the
+        chunks are committed, so that an interrupted import is not skipped.
+        '''
+
+        (size, mtime, digest), watermark, changes = result
         frost = get_session()
-        sqla_folders = {}
-
-        # add folder structure to the database
-        sorted_folders = sorted(
-            folders.values(),
-            # parent_folder_id is None for root folder
-            key=lambda item: item.parent_folder_id or 0
-        )
-
-        # first sort the tree by parent IDs so that there is each parent
-        # available, however in case there is a kind-of circular relationship
-        # between the folders e.g. the ID of a child is smaller than ID of
-        # a parent which might be caused by browser importing old bookmarks
-        # from database directly or from a different browser while incorrectly
-        # setting IDs (or better said re-using already existing IDs when
-        # possible), therefore sorting by parent ID would work, but when trying
-        # to access the parent a KeyError would be raised because of parent
-        # not being available yet due to higher ID than the child has
-        #
-        # for that reason try to sort with parent ID first and postpone
-        # the relationship evaluation by using second/third/etc/... item
-        # in the sorted list until there is parent ID available (or throw
-        # IndexError in the end which would pretty much mean that the browser
-        # DB is just broken due to missing parent / dangling children)
-        idx = 0
-        while sorted_folders:
-            folder = sorted_folders[idx]
-
-            kwargs = {
-                'folder_name': folder.folder_name
-            }
-            if folder.parent_folder_id:
-                # in case there is a parent, get the Folder object
-                # and pull its ID after flush() (otherwise it's None)
-                try:
-                    real_id = sqla_folders[folder.parent_folder_id].id
-                except KeyError:
-                    idx += 1
-                    continue
+        try:
+            source = self._get_source(session=frost, path=path, name=name)
+            if changes is not None:
+                self._apply_changes(
+                    session=frost, source_id=source.id, changes=changes,
+                    progress=ImportProgress(
+                        path=path, total=changes['total'],
+                        callback=progress
+                    ),
+                    icon_pool=icon_pool
+                )
+            source.watermark = watermark
+            source.size = size
+            source.mtime = mtime
+            source.digest = digest
+
+            # write data into internal DB
+            frost.commit()
+        finally:
+            frost.close()
+        return changes is not None
+
+    @ensure_annotations
+    def _get_source(
+            self, session: Session, path: str, name: str = ''
+    ) -> ImportSource:
+        '''
+        Return the `ImportSource` of a file (or of its `name` if given)
+        for the current backend, create it if it wasn't imported yet.
+        '''
+
+        path = name or abspath(path)
+        source = session.query(ImportSource).filter(
+            ImportSource.backend == self.name,
+            ImportSource.path == path
+        ).first()
+        if not source:
+            source = ImportSource(backend=self.name, path=path)
+            session.add(source)
+            session.flush()
+        return source
 
-                kwargs['parent_folder_id'] = real_id
+    @ensure_annotations
+    def forget_source(self, path: str, name: str = ''):
+        '''
+        Remove the `ImportSource` of a file (see `_get_source`) and its
+        identity map, the imported items are kept. The next import of the
+        file then only adds all of its items again, nothing is removed.
+        '''
+
+        items = ImportItem.__table__  # pylint: disable=no-member
+        frost = get_session()
+        try:
+            source = frost.query(ImportSource).filter(
+                ImportSource.backend == self.name,
+                ImportSource.path == (name or abspath(path))
+            ).first()
+            if source:
+                frost.execute(
+                    items.delete().where(items.c.source_id == source.id)
+                )
+                frost.delete(source)
+            frost.commit()
+        finally:
+            frost.close()
+
+    @staticmethod
+    @ensure_annotations
+    def _load_items(session: Session, source_id: int) -> dict:
+        '''
+        Return the identity map of a source as a dictionary of node types
+        pointing to native GUIDs mapped to the internal IDs.
+        '''
+
+        kinds = {
+            Folder.__tablename__: Folder,
+            Bookmark.__tablename__: Bookmark
+        }
+        stored = {Folder: {}, Bookmark: {}}
+        items = ImportItem.__table__  # pylint: disable=no-member
+        for kind, native_id, item_id in session.execute(select([
+                items.c.kind, items.c.native_id, items.c.item_id
+        ]).where(items.c.source_id == source_id)):
+            stored[kinds[kind]][native_id] = item_id
+        return stored
+
+    @staticmethod
+    @ensure_annotations
+    def _load_rows(
+            session: Session, source_id: int, model: MetaBase,
+            columns: tuple, ids: list = None
+    ) -> dict:
+        '''
+        Return the current values of `columns` for the items of `model`
+        imported from a source (only for `ids` if specified) as a dictionary
+        of internal IDs pointing to tuples of the values (without the ID).
+        '''
+
+        table = model.__table__
+        items = ImportItem.__table__  # pylint: disable=no-member
+        query = select([table.c[column] for column in columns]).select_from(
+            table.join(items, and_(
+                items.c.item_id == table.c.id,
+                items.c.kind == model.__tablename__,
+                items.c.source_id == source_id
+            ))
+        )
+        if ids is not None:
+            if not ids:
+                return {}
+            query = query.where(table.c.id.in_(ids))
+        return {row[0]: tuple(row[1:]) for row in session.execute(query)}
+
+    @ensure_annotations
+    def _apply_changes(
+            self, session: Session, source_id: int, changes: dict,
+            progress: ImportProgress, icon_pool=None
+    ):
+        '''
+        Upsert the `changes` of a source (see `read`) through its identity
+        map and remove the mapped items missing in the source.
+
+        The records reference each other by the native IDs which are not
+        stable (e.g. Chrome re-numbers the items on sync), therefore only
+        the GUIDs are stored and the native IDs are resolved per import.
+
+        Each chunk of new items is committed together with its mapping
+        as a checkpoint, a repeated import then finds the items mapped.
+        The bookmarks are consumed and written chunk by chunk.
+        '''
+
+        # pylint: disable=too-many-locals
+        items = ImportItem.__table__  # pylint: disable=no-member
+        stored = self._load_items(session=session, source_id=source_id)
+
+        def checkpoint(node_type, guids):
+            def save(pairs):
+                session.execute(items.insert(), [{
+                    'source_id': source_id,
+                    'kind': node_type.__tablename__,
+                    'native_id': guids[native_id],
+                    'item_id': item_id
+                } for native_id, item_id in pairs])
+                session.commit()
+                progress.update(len(pairs))
+            return save
+
+        def commit(count):
+            session.commit()
+            progress.update(count)
+
+        # folders removed by the user in the meantime are imported again
+        current = self._load_rows(
+            session=session, source_id=source_id, model=Folder,
+            columns=('id', 'folder_name', 'parent_folder_id')
+        )
+        self._forget_stale(
+            session=session, source_id=source_id, model=Folder,
+            stored=stored[Folder], current=current,
+            guids=list(stored[Folder])
+        )
 
-            new_folder = Folder(**kwargs)
-            frost.add(new_folder)
+        # translate the stored GUIDs to the native IDs in the source
+        folder_guids = changes['folder_guids']
+        mapped = {
+            native_id: stored[Folder][guid]
+            for native_id, guid in folder_guids.items()
+            if guid in stored[Folder]
+        }
+        folders = changes['folders']
 
-            # flush to obtain folder ID,
-            # especially necessary for nested folders
-            frost.flush()
+        # add new folders and remember where they were put
+        folder_ids = {**mapped, **self._insert_folders(
+            session=session,
+            folders=[item for item in folders if item['id'] not in mapped],
+            known=mapped,
+            checkpoint=checkpoint(Folder, folder_guids)
+        )}
 
-            # preserve the original ID and point to a SQLA object
-            sqla_folders[folder.id] = new_folder
+        # update the already imported folders, but only the changed ones
+        root = Folder.get_root()[0]
+        rows = [
+            (
+                mapped[item['id']], item['folder_name'],
+                folder_ids[item['parent_folder_id']]
+                if item['parent_folder_id'] else root
+            )
+            for item in folders if item['id'] in mapped
+        ]
+        rows = [row for row in rows if row[1:] != current[row[0]]]
+        progress.update(sum(
+            item['id'] in mapped for item in folders
+        ) - len(rows))
+        self._update_items(
+            session=session, folders=rows, bookmarks=[], after_chunk=commit
+        )
 
-            # remove current folder
-            idx = 0
-            sorted_folders.remove(folder)
+        bookmarks = iter(changes['bookmarks'])
+        for chunk in iter(lambda: list(islice(
+                bookmarks, self.chunk_size
+        )), []):
+            self._write_bookmarks(
+                session=session, source_id=source_id, chunk=chunk,
+                stored=stored[Bookmark], folder_ids=folder_ids,
+                checkpoint=checkpoint(Bookmark, {
+                    item['id']: item['guid']
+                    for node_type, item in chunk if node_type == Bookmark
+                }),
+                progress=progress,
+                icon_pool=icon_pool
+            )
 
-        # add bookmarks
-        for key in sorted(bookmarks.keys()):
-            book = bookmarks[key]
-            kwargs = {
-                'title': book.title,
-                'url': book.url,
-                'icon': b'',
-                'folder_id': sqla_folders[book.folder_id].id
+        # remove the items missing in the source
+        present = {
+            Folder: set(folder_guids.values()),
+            Bookmark: set(changes['bookmark_guids'])
+        }
+        self._delete_items(
+            session=session,
+            source_id=source_id,
+            removed={
+                node_type: {
+                    guid: item_id
+                    for guid, item_id in stored[node_type].items()
+                    if guid not in present[node_type]
+                }
+                for node_type in (Folder, Bookmark)
             }
+        )
+
+    @ensure_annotations
+    def _write_bookmarks(
+            self, session: Session, source_id: int, chunk: list,
+            stored: dict, folder_ids: dict, checkpoint: Callable,
+            progress: ImportProgress, icon_pool=None
+    ):
+        '''
+        Insert the new and update the changed bookmarks from a `chunk`
+        of bookmark and icon records, `stored` maps the GUIDs of the already
+        imported bookmarks to internal IDs.
+
+        Icons are stored only if their hash is not in the icon store yet,
+        see `_normalize_icons` for `icon_pool`.
+        '''
+        # pylint: disable=too-many-arguments
+
+        icons = [item for node_type, item in chunk if node_type == Icon]
+        if icons and icon_pool:
+            icons = self._normalize_icons(
+                session=session, icons=icons, icon_pool=icon_pool
+            )
+        if icons:
+            icon = Icon.__table__  # pylint: disable=no-member
+            session.execute(icon.insert().prefix_with('OR IGNORE'), icons)
+
+        chunk = [item for node_type, item in chunk if node_type == Bookmark]
+        current = self._load_rows(
+            session=session, source_id=source_id, model=Bookmark,
+            columns=('id', 'title', 'url', 'folder_id', 'icon_hash'),
+            ids=[
+                stored[item['guid']] for item in chunk
+                if item['guid'] in stored
+            ]
+        )
+        self._forget_stale(
+            session=session, source_id=source_id, model=Bookmark,
+            stored=stored, current=current,
+            guids=[item['guid'] for item in chunk]
+        )
+        self._insert_bookmarks(
+            session=session,
+            bookmarks=[item for item in chunk if item['guid'] not in stored],
+            folder_ids=folder_ids,
+            checkpoint=checkpoint
+        )
+
+        rows = [
+            (
+                stored[item['guid']], item['title'], item['url'],
+                folder_ids[item['folder_id']], item.get('icon_hash')
+            )
+            for item in chunk if item['guid'] in stored
+        ]
+        changed = [row for row in rows if row[1:] != current[row[0]]]
+        self._update_items(session=session, folders=[], bookmarks=changed)
+        session.commit()
+        progress.update(len(rows))
+
+    @staticmethod
+    @ensure_annotations
+    def _normalize_icons(session: Session, icons: list, icon_pool) -> list:
+        '''
+        Downscale and re-encode the `icons` missing in the icon store
+        in parallel in `icon_pool` (see `frostmark.icons.normalize_icon`).
+
+        The icons keep the hash of the imported content, therefore the same
+        icon is found in the store and not processed again next time.
+        '''
+
+        table = Icon.__table__  # pylint: disable=no-member
+        present = {
+            row[0] for row in session.execute(select([table.c.hash]).where(
+                table.c.hash.in_([item['hash'] for item in icons])
+            ))
+        }
+        icons = [item for item in icons if item['hash'] not in present]
+        results = icon_pool.map(
+            normalize_icon, [item['data'] for item in icons]
+        )
+        return [
+            {**item, 'mime': result[0], 'data': result[1]}
+            if result else item
+            for item, result in zip(icons, results)
+        ]
+
+    @ensure_annotations
+    def _update_items(
+            self, session: Session, folders: list, bookmarks: list,
+            after_chunk=None
+    ):
+        '''
+        Overwrite already imported folders with ``(id, folder_name,
+        parent_folder_id)`` and bookmarks with ``(id, title, url,
+        folder_id, icon_hash)`` rows, see `_execute_chunked`
+        for `after_chunk`.
+        '''
 
-            # no need to flush, nothing required a bookmark
-            # ID to be present before final commit()
-            new_book = Bookmark(**kwargs)
-            frost.add(new_book)
+        folder = Folder.__table__  # pylint: disable=no-member
+        self._execute_chunked(
+            session=session,
+            statement=folder.update().where(
+                folder.c.id == bindparam('_id')
+            ).values(
+                folder_name=bindparam('_folder_name'),
+                parent_folder_id=bindparam('_parent_folder_id')
+            ),
+            columns=('_id', '_folder_name', '_parent_folder_id'),
+            rows=folders,
+            chunk_size=self.chunk_size,
+            after_chunk=after_chunk
+        )
+
+        bookmark = Bookmark.__table__  # pylint: disable=no-member
+        self._execute_chunked(
+            session=session,
+            statement=bookmark.update().where(
+                bookmark.c.id == bindparam('_id')
+            ).values(
+                title=bindparam('_title'),
+                url=bindparam('_url'),
+                folder_id=bindparam('_folder_id'),
+                icon_hash=bindparam('_icon_hash')
+            ),
+            columns=('_id', '_title', '_url', '_folder_id', '_icon_hash'),
+            rows=bookmarks,
+            chunk_size=self.chunk_size,
+            after_chunk=after_chunk
+        )
+
+    @ensure_annotations
+    def _delete_items(self, session: Session, source_id: int, removed: dict):
+        '''
+        Delete imported folders and bookmarks removed from the source
+        together with their mapping, `removed` maps node types to
+        a dictionary of native GUIDs pointing to the internal ones.
+
+        Items moved into a removed folder by the user are preserved
+        and moved into the internal root folder.
+        '''
+
+        folder = Folder.__table__  # pylint: disable=no-member
+        bookmark = Bookmark.__table__  # pylint: disable=no-member
+        root = Folder.get_root()[0]
+
+        bookmark_ids = [(item_id, ) for item_id in removed[Bookmark].values()]
+        folder_ids = [(item_id, ) for item_id in removed[Folder].values()]
+        statements = (
+            (bookmark.delete().where(bookmark.c.id == bindparam('_id')),
+             bookmark_ids),
+            (bookmark.update().where(
+                bookmark.c.folder_id == bindparam('_id')
+            ).values(folder_id=root), folder_ids),
+            (folder.update().where(
+                folder.c.parent_folder_id == bindparam('_id')
+            ).values(parent_folder_id=root), folder_ids),
+            (folder.delete().where(folder.c.id == bindparam('_id')),
+             folder_ids)
+        )
+        for statement, rows in statements:
+            self._execute_chunked(
+                session=session, statement=statement,
+                columns=('_id', ), rows=rows,
+                chunk_size=self.chunk_size
+            )
+
+        for node_type, natives in removed.items():
+            self._forget_items(
+                session=session, source_id=source_id, model=node_type,
+                guids=list(natives)
+            )
+
+    @ensure_annotations
+    def _forget_items(
+            self, session: Session, source_id: int, model: MetaBase,
+            guids: list
+    ):
+        '''
+        Delete the mapping of the native `guids` of `model` items
+        imported from a source, the items themselves are kept.
+        '''
+
+        items = ImportItem.__table__  # pylint: disable=no-member
+        self._execute_chunked(
+            session=session,
+            statement=items.delete().where(and_(
+                items.c.source_id == source_id,
+                items.c.kind == model.__tablename__,
+                items.c.native_id == bindparam('_native_id')
+            )),
+            columns=('_native_id', ),
+            rows=[(guid, ) for guid in guids],
+            chunk_size=self.chunk_size
+        )
+
+    @ensure_annotations
+    def _forget_stale(
+            self, session: Session, source_id: int, model: MetaBase,
+            stored: dict, current: dict, guids: list
+    ):
+        '''
+        Drop the `guids` from `stored` together with their mapping if
+        the mapped item is not in `current` anymore (e.g. it was removed
+        with the editor), therefore the item is imported again as new.
+        '''
+        # pylint: disable=too-many-arguments
+
+        stale = [
+            guid for guid in guids
+            if guid in stored and stored[guid] not in current
+        ]
+        for guid in stale:
+            del stored[guid]
+        self._forget_items(
+            session=session, source_id=source_id, model=model, guids=stale
+        )
+
+
+@ensure_annotations
+def import_profiles(
+        browser: str, paths: list, jobs: int = 0, force: bool = False,
+        normalize_icons: bool = False
+):
+    '''
+    Import bookmarks from browser profiles and print the skipped ones.
+    '''
 
-        # write data into internal DB
-        frost.commit()
+    imported = Importer(
+        browser, normalize_icons=normalize_icons
+    ).import_many(
+        paths=paths, jobs=jobs, force=force, progress=print_progress
+    )
+    for path, flag in zip(paths, imported):
+        if not flag:
+            print(f'Unchanged since the last import, skipped: {path}')
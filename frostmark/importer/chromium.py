@@ -0,0 +1,130 @@
+'''
+Module for retrieving bookmark data from `Bookmarks` file of Chromium-based
+browsers and providing a clean tree structure for further use.
+'''
+
+import json
+from typing import Iterator
+
+from ensure import ensure_annotations
+
+from frostmark.common import assemble_record_tree
+from frostmark.tree import TreeNode
+from frostmark.models import Folder, Bookmark
+from frostmark.importer import stream as json_stream
+
+
+class ChromiumImporter:
+    '''
+    Assembler for bookmark node tree of Chromium and its forks, all of them
+    share the same `Bookmarks` JSON format and differ only in the folders
+    placed in the ``roots`` object.
+
+    A fork plugs in by subclassing and configuring its root keys.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    # keys in the `roots` object containing a bookmark folder in the same
+    # order as the folders are put into the final tree
+    ROOTS = ('bookmark_bar', 'other', 'synced')
+
+    # keys from `ROOTS` containing an object of multiple bookmark folders
+    # (sorted by their key) instead of a single folder
+    NESTED_ROOTS = ()
+
+    @classmethod
+    @ensure_annotations
+    def walk(cls, raw: dict) -> Iterator:
+        '''
+        Walk the decoded `Bookmarks` JSON in a single iterative pass
+        and yield ``(node_type, item)`` records for both folders and
+        bookmarks, each parent folder before its children.
+
+        Items are identified by their ``guid`` across imports, the ``id``
+        is used instead if the browser did not store any.
+        '''
+
+        yield json_stream.root_record()
+
+        roots = raw['roots']
+        for key in cls.ROOTS:
+            if key not in roots:
+                continue
+
+            if key in cls.NESTED_ROOTS:
+                nodes = [
+                    value for _, value in sorted(
+                        roots[key].items(), key=lambda item: item[0]
+                    )
+                ]
+            else:
+                nodes = [roots[key]]
+
+            # explicit stack instead of recursion, no depth limit
+            stack = [
+                (node, 0) for node in reversed(nodes)
+                if node.get('type') == 'folder'
+            ]
+            while stack:
+                item, parent_id = stack.pop()
+
+                if item['type'] == 'url':
+                    # yay, bookmark
+                    yield (Bookmark, {
+                        'id': int(item['id']),
+                        'guid': item.get('guid') or item['id'],
+                        'title': item['name'] or item['url'],
+                        'folder_id': parent_id,
+                        'url': item['url']
+                    })
+                    continue
+
+                yield (Folder, {
+                    'id': int(item['id']),
+                    'guid': item.get('guid') or item['id'],
+                    'folder_name': item['name'],
+                    'parent_folder_id': parent_id
+                })
+
+                stack.extend(
+                    (child, int(item['id']))
+                    for child in reversed(item.get('children', []))
+                    # some kind of broken structure otherwise
+                    if child.get('type') in ('folder', 'url')
+                )
+
+    @classmethod
+    @ensure_annotations
+    def iter_records(cls, path: str, stream: bool = False) -> Iterator:
+        '''
+        Yield ``(node_type, item)`` records from `Bookmarks` file.
+
+        With `stream` the file is parsed incrementally without loading
+        the whole file into memory, otherwise the whole JSON is decoded
+        at once which is faster for files of a usual size.
+        '''
+
+        if stream:
+            return json_stream.iter_records(
+                path, roots=cls.ROOTS, nested_roots=cls.NESTED_ROOTS
+            )
+
+        with open(path, 'rb') as fbookmark:
+            raw = json.loads(fbookmark.read().decode('utf-8'))
+        return cls.walk(raw)
+
+    @classmethod
+    @ensure_annotations
+    def assemble_import_tree(
+            cls, path: str, stream: bool = False
+    ) -> TreeNode:
+        '''
+        Assemble a bookmark tree structure from `Bookmarks` file to be able
+        to either display or correctly import/merge the structure into
+        internal bookmarks database.
+
+        With `stream` the file is parsed incrementally instead of decoding
+        the whole JSON into a dictionary first.
+        '''
+
+        return assemble_record_tree(cls.iter_records(path, stream=stream))
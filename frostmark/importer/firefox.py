@@ -3,6 +3,12 @@ Module for retrieving bookmark data from Firefox `places.sqlite`
 and providing a clean tree structure for further use.
 '''
 
+import sqlite3
+from contextlib import closing
+from os.path import abspath, dirname, exists, join
+from typing import Iterator
+from urllib.request import pathname2url
+
 from ensure import ensure_annotations
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm.session import Session
@@ -10,10 +16,11 @@ from sqlalchemy.ext.declarative import (
     declarative_base,
     DeferredReflection
 )
-from anytree import Node
 
 from frostmark.common import assemble_folder_tree, assemble_bookmark_tree
-from frostmark.models import Folder, Bookmark
+from frostmark.tree import TreeNode
+from frostmark.icons import hash_icon, sniff_mime
+from frostmark.models import Folder, Bookmark, Icon
 
 
 class FirefoxImporter:
@@ -26,11 +33,180 @@ class FirefoxImporter:
     ITEMTYPE_BOOKMARK = 1
     ITEMTYPE_FOLDER = 2
     ITEMTYPE_SEPARATOR = 3
+
+    # preferred width of an imported favicon
+    ICON_SIZE = 16
     BASE = declarative_base(cls=DeferredReflection)
 
     @staticmethod
     @ensure_annotations
-    def assemble_import_tree(session: Session) -> Node:
+    def connect(path: str) -> sqlite3.Connection:
+        '''
+        Open places.sqlite directly via sqlite3 in a read-only mode.
+
+        The database is opened as immutable, therefore no locks are used
+        and it can be read even while Firefox is running and holding its
+        lock, without copying the file first. The changes still in the WAL
+        file (not checkpointed yet by Firefox) are not visible.
+        '''
+        return sqlite3.connect(FirefoxImporter.uri(path), uri=True)
+
+    @staticmethod
+    @ensure_annotations
+    def uri(path: str) -> str:
+        '''
+        Return SQLite URI for opening a database file as read-only
+        and immutable, see `connect`.
+        '''
+        return f'file:{pathname2url(abspath(path))}?mode=ro&immutable=1'
+
+    @staticmethod
+    @ensure_annotations
+    def get_watermark(path: str) -> int:
+        '''
+        Return the time of the latest change in places.sqlite bookmarks.
+
+        Firefox updates `lastModified` of the parent folder too when
+        an item is removed, therefore an unchanged watermark means there
+        is nothing new to import.
+        '''
+        with closing(FirefoxImporter.connect(path)) as connection:
+            return connection.execute(
+                'SELECT max('
+                'coalesce(max(lastModified), 0), coalesce(max(dateAdded), 0)'
+                ') FROM moz_bookmarks'
+            ).fetchone()[0]
+
+    @staticmethod
+    @ensure_annotations
+    def iter_native_ids(path: str) -> Iterator:
+        '''
+        Yield ``(node_type, id, guid)`` for all of the folders and bookmarks
+        in places.sqlite to find out which items were removed.
+        '''
+        with closing(FirefoxImporter.connect(path)) as connection:
+            cursor = connection.execute(
+                'SELECT id, guid FROM moz_bookmarks WHERE type = ?',
+                (FirefoxImporter.ITEMTYPE_FOLDER, )
+            )
+            for item_id, guid in cursor:
+                yield (Folder, item_id, guid or str(item_id))
+
+            cursor = connection.execute(
+                'SELECT b.id, b.guid FROM moz_bookmarks AS b '
+                'JOIN moz_places AS p ON b.fk = p.id '
+                'WHERE b.type = ?',
+                (FirefoxImporter.ITEMTYPE_BOOKMARK, )
+            )
+            for item_id, guid in cursor:
+                yield (Bookmark, item_id, guid or str(item_id))
+
+    @staticmethod
+    @ensure_annotations
+    def iter_records(
+            path: str, since: int = 0, icons: bool = False
+    ) -> Iterator:
+        '''
+        Yield ``(node_type, item)`` records from places.sqlite fetching
+        only the necessary columns with plain cursors, folders first.
+
+        Unlike with `assemble_import_tree` there is no need for a SQLAlchemy
+        engine and reflecting the ``moz_*`` tables.
+
+        With `since` (see `get_watermark`) only the items added
+        or modified later are yielded.
+
+        With `icons` the bookmarks are joined with their favicons from
+        favicons.sqlite in the same profile folder. Each distinct icon
+        is yielded only once as an `Icon` record right before the first
+        bookmark referencing it by ``icon_hash``.
+        '''
+        favicons = join(dirname(abspath(path)), 'favicons.sqlite')
+        icons = icons and exists(favicons)
+
+        with closing(FirefoxImporter.connect(path)) as connection:
+            cursor = connection.execute(
+                'SELECT id, guid, title, parent FROM moz_bookmarks '
+                'WHERE type = ? AND (lastModified > ? OR dateAdded > ?) '
+                'ORDER BY id',
+                (FirefoxImporter.ITEMTYPE_FOLDER, since, since)
+            )
+            for item_id, guid, title, parent in cursor:
+                yield (Folder, {
+                    'id': item_id,
+                    'guid': guid or str(item_id),
+                    'folder_name': title or '<no title>',
+                    'parent_folder_id': parent or None
+                })
+
+            if not icons:
+                cursor = connection.execute(
+                    'SELECT b.id, b.guid, b.title, b.parent, p.url, NULL '
+                    'FROM moz_bookmarks AS b '
+                    'JOIN moz_places AS p ON b.fk = p.id '
+                    'WHERE b.type = ? '
+                    'AND (b.lastModified > ? OR b.dateAdded > ?) '
+                    'ORDER BY p.id',
+                    (FirefoxImporter.ITEMTYPE_BOOKMARK, since, since)
+                )
+            else:
+                connection.execute(
+                    'ATTACH DATABASE ? AS favicons',
+                    (FirefoxImporter.uri(favicons), )
+                )
+
+                # a single join for all bookmarks, the preferred icon
+                # of a page is the smallest one with at least ICON_SIZE
+                cursor = connection.execute(
+                    'SELECT b.id, b.guid, b.title, b.parent, p.url, f.icon '
+                    'FROM moz_bookmarks AS b '
+                    'JOIN moz_places AS p ON b.fk = p.id '
+                    'LEFT JOIN ('
+                    'SELECT w.page_url AS url, t.icon_id AS icon, '
+                    'min((i.width < ?) * 65536 + i.width) '
+                    'FROM favicons.moz_pages_w_icons AS w '
+                    'JOIN favicons.moz_icons_to_pages AS t '
+                    'ON t.page_id = w.id '
+                    'JOIN favicons.moz_icons AS i ON i.id = t.icon_id '
+                    'GROUP BY w.page_url'
+                    ') AS f ON f.url = p.url '
+                    'WHERE b.type = ? '
+                    'AND (b.lastModified > ? OR b.dateAdded > ?) '
+                    'ORDER BY p.id',
+                    (
+                        FirefoxImporter.ICON_SIZE,
+                        FirefoxImporter.ITEMTYPE_BOOKMARK, since, since
+                    )
+                )
+
+            # moz_icons.id -> hash of the already yielded icons
+            hashes = {}
+            for item_id, guid, title, parent, url, icon_id in cursor:
+                if icon_id is not None and icon_id not in hashes:
+                    data, = connection.execute(
+                        'SELECT data FROM favicons.moz_icons WHERE id = ?',
+                        (icon_id, )
+                    ).fetchone()
+                    hashes[icon_id] = hash_icon(data) if data else None
+                    if data:
+                        yield (Icon, {
+                            'hash': hashes[icon_id],
+                            'mime': sniff_mime(data),
+                            'data': data
+                        })
+
+                yield (Bookmark, {
+                    'id': item_id,
+                    'guid': guid or str(item_id),
+                    'title': title or url,
+                    'folder_id': parent,
+                    'url': url,
+                    'icon_hash': hashes.get(icon_id)
+                })
+
+    @staticmethod
+    @ensure_annotations
+    def assemble_import_tree(session: Session) -> TreeNode:
         '''
         Assemble a bookmark tree structure from places.sqlite to be able
         to either display or correctly import/merge the structure into
@@ -0,0 +1,77 @@
+'''
+Module for tracking and reporting the progress of an import.
+'''
+
+import sys
+from time import monotonic
+
+from ensure import ensure_annotations
+
+
+class ImportProgress:
+    '''
+    Progress of writing the records of a single imported file
+    into internal database, passed to a callback after each chunk.
+    '''
+
+    @ensure_annotations
+    def __init__(self, path: str, total: int, callback=None):
+        self.path = path
+        self.total = total
+        self.done = 0
+        self.started = monotonic()
+        self.callback = callback
+
+    @ensure_annotations
+    def update(self, count: int):
+        '''
+        Add `count` of processed items and notify the callback.
+        '''
+        self.done += count
+        if count and self.callback:
+            self.callback(self)
+
+    @property
+    def rate(self) -> float:
+        '''
+        Processed items per second.
+        '''
+        elapsed = monotonic() - self.started
+        return self.done / elapsed if elapsed else 0.0
+
+    @property
+    def eta(self):
+        '''
+        Estimated number of seconds until the import is finished
+        or `None` if nothing has been processed yet.
+        '''
+        rate = self.rate
+        return (self.total - self.done) / rate if rate else None
+
+    def as_dict(self) -> dict:
+        '''
+        Return the progress as a JSON-serializable dictionary.
+        '''
+        return {
+            'path': self.path,
+            'done': self.done,
+            'total': self.total,
+            'rate': self.rate,
+            'eta': self.eta
+        }
+
+    def __str__(self):
+        eta = self.eta
+        eta_text = f'{eta:.0f} s' if eta is not None else '?'
+        return (
+            f'{self.path}: {self.done}/{self.total} items, '
+            f'{self.rate:.0f} items/s, ETA {eta_text}'
+        )
+
+
+def print_progress(progress: ImportProgress):
+    '''
+    Print the progress over the same line of STDERR.
+    '''
+    end = '\n' if progress.done >= progress.total else ''
+    print(f'\r{progress}', end=end, file=sys.stderr, flush=True)
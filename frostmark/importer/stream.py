@@ -0,0 +1,407 @@
+'''
+Module for incremental parsing of Chromium-like `Bookmarks` JSON files
+so that the memory usage does not depend on the size of the file.
+'''
+
+import re
+from json import JSONDecodeError
+from json.decoder import scanstring
+from typing import Iterator
+
+from ensure import ensure_annotations
+
+from frostmark.models import Folder, Bookmark
+
+# amount of characters read from the file at once
+CHUNK_SIZE = 64 * 1024
+
+# node keys with a scalar value worth keeping, the rest is skipped
+NODE_KEYS = ('id', 'guid', 'name', 'type', 'url')
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+SCALAR = re.compile(r'[^ \t\n\r,:\[\]{}"]*')
+NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+LITERALS = {
+    'true': ('boolean', True),
+    'false': ('boolean', False),
+    'null': ('null', None)
+}
+
+
+class EventParser:
+    '''
+    Hand-rolled incremental JSON parser producing a flat stream of
+    `(event, value)` tuples from a text file object read in chunks.
+
+    Events: ``start_map``, ``map_key``, ``end_map``, ``start_array``,
+    ``end_array``, ``string``, ``number``, ``boolean`` and ``null``.
+
+    Only the unconsumed part of the current chunk is kept in memory.
+    The parser checks only bracket matching, not the full JSON grammar,
+    which is enough for the files written by browsers.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buff = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self) -> bool:
+        '''
+        Drop the consumed part of the buffer and append another chunk,
+        return `False` if there is nothing left in the file.
+        '''
+
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buff = self.buff[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        '''
+        Move the position to the next non-whitespace character
+        or to the end of the file.
+        '''
+
+        while True:
+            self.pos = WHITESPACE.match(self.buff, self.pos).end()
+            if self.pos < len(self.buff) or not self._read():
+                return
+
+    def _string(self) -> str:
+        '''
+        Decode a string starting at the current position (quote).
+        '''
+
+        while True:
+            try:
+                value, self.pos = scanstring(self.buff, self.pos + 1)
+                return value
+            except JSONDecodeError:
+                # string (or an escape sequence) split between chunks
+                if not self._read():
+                    raise
+
+    def _scalar(self) -> tuple:
+        '''
+        Decode a number or a literal starting at the current position.
+        '''
+
+        # the token ends with a delimiter, make sure it's in the buffer
+        match = SCALAR.match(self.buff, self.pos)
+        while match.end() == len(self.buff) and self._read():
+            match = SCALAR.match(self.buff, self.pos)
+
+        token = match.group()
+        if token in LITERALS:
+            result = LITERALS[token]
+        elif token and NUMBER.fullmatch(token):
+            number = NUMBER.fullmatch(token)
+            if any(number.groups()):
+                result = ('number', float(token))
+            else:
+                result = ('number', int(token))
+        else:
+            raise JSONDecodeError('Unexpected token', self.buff, self.pos)
+
+        self.pos = match.end()
+        return result
+
+    def __iter__(self) -> Iterator:
+        # True for an object, False for an array
+        stack = []
+        expect_key = False
+
+        while True:
+            self._skip_whitespace()
+            if self.pos >= len(self.buff):
+                break
+
+            char = self.buff[self.pos]
+            if char in '{[':
+                self.pos += 1
+                stack.append(char == '{')
+                expect_key = stack[-1]
+                yield ('start_map' if stack[-1] else 'start_array', None)
+
+            elif char in '}]':
+                if not stack or stack.pop() != (char == '}'):
+                    raise JSONDecodeError(
+                        'Unexpected bracket', self.buff, self.pos
+                    )
+                self.pos += 1
+                expect_key = False
+                yield ('end_map' if char == '}' else 'end_array', None)
+
+            elif char == ',':
+                self.pos += 1
+                expect_key = bool(stack) and stack[-1]
+
+            elif char == ':':
+                self.pos += 1
+                expect_key = False
+
+            elif char == '"':
+                value = self._string()
+                yield ('map_key' if expect_key else 'string', value)
+                expect_key = False
+
+            else:
+                yield self._scalar()
+
+        if stack:
+            raise JSONDecodeError(
+                'Unexpected end of file', self.buff, self.pos
+            )
+
+
+def root_record() -> tuple:
+    '''
+    Create the record of the artificial ``<no title>`` root folder with
+    ID 0 all of the ``roots`` folders of a `Bookmarks` file belong to.
+    '''
+
+    return (Folder, {
+        'id': 0,
+        'guid': '0',
+        'folder_name': '<no title>',
+        'parent_folder_id': None
+    })
+
+
+def next_event(events: Iterator) -> tuple:
+    '''
+    Return the next `(event, value)` tuple, raise `JSONDecodeError`
+    instead of `StopIteration` if the document ended too early.
+    '''
+
+    try:
+        return next(events)
+    except StopIteration:
+        raise JSONDecodeError('Unexpected end of file', '', 0) from None
+
+
+def skip_value(events: Iterator, event: str):
+    '''
+    Consume the rest of a value which started with `event`.
+    '''
+
+    depth = int(event in ('start_map', 'start_array'))
+    while depth:
+        event, _ = next_event(events)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+
+
+class _NodeFrame:
+    '''
+    Partially parsed bookmark node (folder or url) with records of its
+    children waiting for the node's ID to be known.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('fields', 'pending', 'in_children')
+
+    def __init__(self):
+        self.fields = {}
+        self.pending = []
+        self.in_children = False
+
+
+def _root_key(keys: list, roots: tuple, nested_roots: tuple):
+    '''
+    Return a sorting key for a root folder located at `keys` path
+    in the JSON document or `None` if it's not a root folder.
+    '''
+
+    if len(keys) == 2 and keys[0] == 'roots':
+        if keys[1] in roots and keys[1] not in nested_roots:
+            return (roots.index(keys[1]), '')
+
+    elif len(keys) == 3 and keys[0] == 'roots':
+        if keys[1] in nested_roots:
+            return (roots.index(keys[1]), keys[2])
+    return None
+
+
+def _make_record(fields: dict, parent_id: int):
+    '''
+    Create a folder or bookmark record from the collected node fields,
+    return `None` for unknown node types.
+    '''
+
+    if fields.get('type') == 'folder':
+        return (Folder, {
+            'id': int(fields['id']),
+            'guid': fields.get('guid') or str(fields['id']),
+            'folder_name': fields.get('name', ''),
+            'parent_folder_id': parent_id
+        })
+
+    if fields.get('type') == 'url':
+        return (Bookmark, {
+            'id': int(fields['id']),
+            'guid': fields.get('guid') or str(fields['id']),
+            'title': fields.get('name') or fields['url'],
+            'folder_id': parent_id,
+            'url': fields['url']
+        })
+    return None
+
+
+def _set_parent(record: tuple, parent_id: int) -> tuple:
+    '''
+    Point a record to its parent folder.
+    '''
+
+    node_type, item = record
+    if node_type == Folder:
+        item['parent_folder_id'] = parent_id
+    else:
+        item['folder_id'] = parent_id
+    return record
+
+
+def _walk_nodes(events: Iterator, frames: list) -> Iterator:
+    '''
+    Walk a single root bookmark node (the first frame) iteratively and yield
+    the records of its descendants, the root record is stored back into its
+    frame's `fields` under the ``record`` key.
+    '''
+    # pylint: disable=too-many-branches
+
+    while frames:
+        frame = frames[-1]
+        event, value = next_event(events)
+
+        if frame.in_children:
+            if event == 'start_map':
+                frames.append(_NodeFrame())
+            elif event == 'end_array':
+                frame.in_children = False
+            else:
+                skip_value(events, event)
+            continue
+
+        if event == 'map_key' and value == 'children':
+            event, _ = next_event(events)
+            if event == 'start_array':
+                frame.in_children = True
+            else:
+                skip_value(events, event)
+
+        elif event == 'map_key' and value in NODE_KEYS:
+            event, field = next_event(events)
+            if event in ('start_map', 'start_array'):
+                skip_value(events, event)
+                continue
+            frame.fields[value] = field
+
+            # the ID is usually after the children, release them
+            if value == 'id':
+                for record in frame.pending:
+                    yield _set_parent(record, int(field))
+                frame.pending = []
+
+        elif event == 'map_key':
+            skip_value(events, next_event(events)[0])
+
+        elif event == 'end_map':
+            frames.pop()
+            if 'type' not in frame.fields:
+                # some kind of broken structure
+                continue
+
+            if not frames:
+                frame.fields['record'] = _make_record(frame.fields, 0)
+                continue
+
+            parent = frames[-1].fields
+            record = _make_record(
+                frame.fields, int(parent['id']) if 'id' in parent else None
+            )
+            if record is None:
+                continue
+
+            if 'id' in parent:
+                yield record
+            else:
+                frames[-1].pending.append(record)
+
+
+@ensure_annotations
+def iter_records(
+        path: str, roots: tuple, nested_roots: tuple = (),
+        chunk_size: int = CHUNK_SIZE
+) -> Iterator:
+    '''
+    Parse a `Bookmarks` file incrementally and yield ``(node_type, item)``
+    records as soon as the parent folder of an item is known.
+
+    `roots` are the keys in the ``roots`` object containing a bookmark
+    folder, `nested_roots` are the ones containing an object of multiple
+    bookmark folders instead (see `ChromiumImporter`).
+
+    The first record is the artificial root folder (see `root_record`)
+    all of the ``roots`` folders belong to. The records of the ``roots``
+    folders come last in the order defined by `roots`, their children are
+    yielded right after being parsed, therefore the memory usage is bounded
+    by the depth and width of the folder structure, not by the file size.
+    '''
+
+    yield root_record()
+
+    root_records = []
+    with open(path, encoding='utf-8') as fbookmark:
+        events = iter(EventParser(fbookmark, chunk_size=chunk_size))
+
+        # keys of the containers the parser is currently in
+        # and the last key in the current object
+        keys = []
+        key = None
+
+        for event, value in events:
+            if event == 'map_key':
+                key = value
+                continue
+
+            if event in ('end_map', 'end_array'):
+                keys.pop()
+                key = None
+                continue
+
+            if event == 'start_array':
+                keys.append(key)
+                key = None
+                continue
+
+            if event != 'start_map':
+                continue
+
+            root_key = _root_key(keys[1:] + [key], roots, nested_roots)
+            if root_key is None:
+                keys.append(key)
+                key = None
+                continue
+
+            frames = [_NodeFrame()]
+            frame = frames[0]
+            yield from _walk_nodes(events, frames)
+            if frame.fields.get('record'):
+                root_records.append((root_key, frame.fields['record']))
+            key = None
+
+    for _, record in sorted(root_records, key=lambda item: item[0]):
+        yield record
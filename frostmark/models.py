@@ -3,8 +3,10 @@ ORM SQLAlchemy models for Frostmark application storage.
 '''
 
 from ensure import ensure_annotations
-from sqlalchemy import Column, Integer, String, BLOB, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, Integer, String, BLOB, ForeignKey, UniqueConstraint
+)
+from sqlalchemy.orm import relationship, deferred
 from frostmark.db import BASE
 
 
@@ -24,7 +26,7 @@ class Folder(BASE):
     folder_name = Column(String, nullable=False, default='')
     parent_folder_id = Column(
         Integer, ForeignKey('folder.id'),
-        nullable=False, default=0
+        nullable=False, default=0, index=True
     )
 
     # not a column
@@ -56,6 +58,9 @@ class Folder(BASE):
 class Bookmark(BASE):
     '''
     Bookmark item containing URL, title, icon (favicon.ico) and folder_id.
+
+    The icon is referenced by its hash in the `Icon` store, `icon` column
+    is a leftover of icons stored inline and isn't loaded unless asked for.
     '''
     # pylint: disable=too-few-public-methods
 
@@ -63,12 +68,13 @@ class Bookmark(BASE):
 
     id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
     title = Column(String, nullable=False)
-    url = Column(String, nullable=False)
-    icon = Column(BLOB, nullable=False)
+    url = Column(String, nullable=False, index=True)
+    icon = deferred(Column(BLOB, nullable=False, default=b''))
     folder_id = Column(
         Integer, ForeignKey('folder.id'),
-        nullable=False, default=0
+        nullable=False, default=0, index=True
     )
+    icon_hash = Column(String, ForeignKey('icon.hash'))
 
     def __repr__(self):
         return (
@@ -79,3 +85,115 @@ class Bookmark(BASE):
                 self.url, self.folder_id
             )
         )
+
+
+class Icon(BASE):
+    '''
+    Icon (favicon) content stored only once for all of the bookmarks
+    using the same icon, identified by a hash of the content.
+
+    Icons normalized on import (see `frostmark.icons.normalize_icon`)
+    keep the hash of the imported content.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    __tablename__ = 'icon'
+
+    hash = Column(String, primary_key=True, nullable=False)
+    mime = Column(String, nullable=False)
+    data = Column(BLOB, nullable=False)
+
+    def __repr__(self):
+        return (
+            "<Icon("
+            "hash='%s', mime='%s', size=%s"
+            ")>" % (
+                self.hash, self.mime, len(self.data or b'')
+            )
+        )
+
+
+class Generation(BASE):
+    '''
+    Single row counting the changes of folders and bookmarks, `value`
+    is incremented by triggers on each written row (see
+    `frostmark.db.create_generation`), `token` is random for each DB
+    to tell a new DB at the same path apart.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    __tablename__ = 'generation'
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    token = Column(String, nullable=False)
+    value = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            "<Generation("
+            "token='%s', value=%s"
+            ")>" % (
+                self.token, self.value
+            )
+        )
+
+
+class ImportSource(BASE):
+    '''
+    Browser profile (file) the bookmarks were imported from together with
+    a watermark of the last import to import only the changes next time
+    and the size, mtime (ns) and content digest of the file to skip
+    the unchanged files completely.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    __tablename__ = 'import_source'
+    __table_args__ = (UniqueConstraint('backend', 'path'), )
+
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    backend = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    watermark = Column(Integer, nullable=False, default=0)
+    size = Column(Integer)
+    mtime = Column(Integer)
+    digest = Column(String)
+
+    def __repr__(self):
+        return (
+            "<ImportSource("
+            "id=%s, backend='%s', path='%s', watermark=%s, digest='%s'"
+            ")>" % (
+                self.id, self.backend,
+                self.path, self.watermark, self.digest
+            )
+        )
+
+
+class ImportItem(BASE):
+    '''
+    Mapping of an item from an import source (browser's native GUID) to
+    an internal Folder or Bookmark ID.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    __tablename__ = 'import_item'
+
+    source_id = Column(
+        Integer, ForeignKey('import_source.id'),
+        primary_key=True, nullable=False
+    )
+
+    # Folder or Bookmark table name
+    kind = Column(String, primary_key=True, nullable=False)
+    native_id = Column(String, primary_key=True, nullable=False)
+    item_id = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return (
+            "<ImportItem("
+            "source_id=%s, kind='%s', native_id='%s', item_id=%s"
+            ")>" % (
+                self.source_id, self.kind,
+                self.native_id, self.item_id
+            )
+        )
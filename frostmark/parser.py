@@ -3,17 +3,22 @@ Module for parsing arguments from console.
 '''
 
 from argparse import ArgumentParser, Action
+from importlib import import_module
 
 from frostmark import VERSION, __name__ as name
-from frostmark.common import fetch_bookmark_tree, print_bookmark_tree
-from frostmark.editor import Editor
-from frostmark.importer import Importer
-from frostmark.exporter import Exporter
-from frostmark.profiles import print_profiles, print_all_profiles
-from frostmark.licenses import Licenses
 from frostmark.core.console import Console
 
 
+def load(target: str):
+    '''
+    Import and return an object from ``module:name`` `target` only when
+    an argument needs it, so that e.g. ``--help`` does not pay for importing
+    SQLAlchemy and all of the importers.
+    '''
+    module, attr = target.split(':')
+    return getattr(import_module(module), attr)
+
+
 class ExecuteAction(Action):
     '''ArgumentParser action for add_argument(action=...)
 
@@ -25,7 +30,8 @@ class ExecuteAction(Action):
       * func_kwargs
 
     together with argument values inserted into func_kwargs
-    as 'arg_values' and exits immediately.
+    as 'arg_values' (and the namespace of the already parsed
+    arguments as 'namespace') and exits immediately.
     '''
     # pylint: disable=too-few-public-methods
 
@@ -39,10 +45,24 @@ class ExecuteAction(Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
         self.func_kwargs['arg_values'] = values
+        self.func_kwargs['namespace'] = namespace
         self.func(*self.func_args, **self.func_kwargs)
         exit()
 
 
+class DatabaseAction(Action):
+    '''ArgumentParser action for add_argument(action=...)
+
+    Points the internal DB to a different location immediately,
+    so that the ExecuteAction arguments parsed after it use it.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        load('frostmark.db_base:use_database')(values)
+        setattr(namespace, self.dest, values)
+
+
 class FrostmarkArgumentParser(ArgumentParser):
     '''
     Inheriting from `ArgumentParser` to print custom print message.
@@ -77,6 +97,16 @@ SUBPARSERS = PARSER.add_subparsers()
 PARSER.console_parser = SUBPARSERS.add_parser('console')
 PARSER.gui_parser = SUBPARSERS.add_parser('gui')
 
+for subparser in (PARSER.console_parser, PARSER.gui_parser):
+    subparser.add_argument(
+        '--database',
+        help=(
+            'path to the Frostmark database or :memory: for a database '
+            'lost on exit, overrides FROSTMARK_DB (put first)'
+        ),
+        required=False, metavar='PATH', action=DatabaseAction
+    )
+
 # add optional argument for console parser
 PARSER.console_parser.add_argument(
     '-l', '--list-bookmarks',
@@ -86,9 +116,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: print_bookmark_tree(
-            fetch_bookmark_tree()
-        )
+        func=lambda *args, **kwargs: load(
+            'frostmark.common:print_bookmark_tree'
+        )(load('frostmark.common:fetch_bookmark_tree')())
     )
 )
 
@@ -101,9 +131,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: print_profiles(
-            kwargs['arg_values'][0]
-        )
+        func=lambda *args, **kwargs: load(
+            'frostmark.profiles:print_profiles'
+        )(kwargs['arg_values'][0])
     )
 )
 
@@ -115,25 +145,57 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: print_all_profiles()
+        func=lambda *args, **kwargs: load(
+            'frostmark.profiles:print_all_profiles'
+        )()
     )
 )
 
+PARSER.console_parser.add_argument(
+    '-j', '--jobs',
+    help=(
+        'number of processes parsing the imported profiles, '
+        'one per CPU core by default (put before -i)'
+    ),
+    required=False, type=int, default=0
+)
+
+PARSER.console_parser.add_argument(
+    '-f', '--force',
+    help=(
+        're-import the profiles even if they have not changed '
+        'since the last import (put before -i)'
+    ),
+    required=False, action='store_true'
+)
+
+PARSER.console_parser.add_argument(
+    '--normalize-icons',
+    help=(
+        'downscale the imported icons to 16 or 32 px and re-encode them '
+        'as PNG, requires Pillow (put before -i)'
+    ),
+    required=False, action='store_true'
+)
+
 PARSER.console_parser.add_argument(
     '-i', '--import-bookmarks',
-    help='import bookmarks from a browser profile',
+    help='import bookmarks from browser profiles',
     required=False, nargs='+',
     metavar=('BROWSER', 'PROFILE'),
 
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: [
-            Importer(
-                kwargs['arg_values'][0]
-            ).import_from(val)
-            for val in kwargs['arg_values'][1:]
-        ]
+        func=lambda *args, **kwargs: load(
+            'frostmark.importer:import_profiles'
+        )(
+            browser=kwargs['arg_values'][0],
+            paths=kwargs['arg_values'][1:],
+            jobs=kwargs['namespace'].jobs,
+            force=kwargs['namespace'].force,
+            normalize_icons=kwargs['namespace'].normalize_icons
+        )
     )
 )
 
@@ -146,7 +208,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Exporter().export_to(
+        func=lambda *args, **kwargs: load(
+            'frostmark.exporter:Exporter'
+        )().export_to(
             path=kwargs['arg_values'][0]
         )
     )
@@ -161,7 +225,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Editor.change_parent_folder(
+        func=lambda *args, **kwargs: load(
+            'frostmark.editor:Editor'
+        ).change_parent_folder(
             folder_id=int(kwargs['arg_values'][0]),
             parent_id=int(kwargs['arg_values'][1])
         )
@@ -177,7 +243,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Editor.change_parent_bookmark(
+        func=lambda *args, **kwargs: load(
+            'frostmark.editor:Editor'
+        ).change_parent_bookmark(
             bookmark_id=int(kwargs['arg_values'][0]),
             parent_id=int(kwargs['arg_values'][1])
         )
@@ -193,7 +261,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Editor.rename_folder(
+        func=lambda *args, **kwargs: load(
+            'frostmark.editor:Editor'
+        ).rename_folder(
             folder_id=int(kwargs['arg_values'][0]),
             name=kwargs['arg_values'][1]
         )
@@ -209,7 +279,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Editor.rename_bookmark(
+        func=lambda *args, **kwargs: load(
+            'frostmark.editor:Editor'
+        ).rename_bookmark(
             bookmark_id=int(kwargs['arg_values'][0]),
             name=kwargs['arg_values'][1]
         )
@@ -225,7 +297,9 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Editor.change_bookmark_url(
+        func=lambda *args, **kwargs: load(
+            'frostmark.editor:Editor'
+        ).change_bookmark_url(
             bookmark_id=int(kwargs['arg_values'][0]),
             url=kwargs['arg_values'][1]
         )
@@ -241,6 +315,8 @@ PARSER.console_parser.add_argument(
     # pylint: disable=unnecessary-lambda
     action=lambda *args, **kwargs: ExecuteAction(
         *args, **kwargs,
-        func=lambda *args, **kwargs: Licenses.print_all_licenses()
+        func=lambda *args, **kwargs: load(
+            'frostmark.licenses:Licenses'
+        ).print_all_licenses()
     )
 )
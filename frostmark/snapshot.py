@@ -0,0 +1,257 @@
+'''
+Module for a columnar snapshot of the whole bookmark tree.
+'''
+
+import re
+
+from ensure import ensure_annotations
+
+try:
+    import numpy as np
+except ImportError:
+    # optional, only for TreeSnapshot
+    np = None
+
+# values of TreeSnapshot.kinds
+FOLDER = 0
+BOOKMARK = 1
+
+
+@ensure_annotations
+def require_numpy():
+    '''
+    Raise an exception if NumPy needed for `TreeSnapshot` is missing.
+    '''
+    if np is None:
+        raise Exception(
+            'NumPy is required for tree snapshots, '
+            'install frostmark[snapshot]'
+        )
+
+
+class StringColumn:
+    '''
+    Strings encoded into a single UTF-8 buffer, the string at a position
+    ends where the next one starts in `offsets`.
+    '''
+
+    __slots__ = ('buffer', 'offsets')
+
+    def __init__(self, values: list):
+        encoded = [value.encode('utf-8') for value in values]
+        self.buffer = b''.join(encoded)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(
+            np.fromiter(map(len, encoded), dtype=np.int64),
+            out=self.offsets[1:]
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        start, end = self.offsets[position:position + 2]
+        return self.buffer[start:end].decode('utf-8')
+
+    @ensure_annotations
+    def find(self, text: str):
+        '''
+        Return the sorted positions of the strings containing `text`,
+        the whole buffer is scanned at once.
+        '''
+
+        if not text:
+            return np.arange(len(self), dtype=np.int64)
+
+        starts = np.fromiter(
+            (match.start() for match in re.finditer(
+                re.escape(text.encode('utf-8')), self.buffer
+            )),
+            dtype=np.int64
+        )
+        positions = np.searchsorted(self.offsets, starts, side='right') - 1
+
+        # skip matches spanning over multiple strings
+        inside = starts + len(text.encode('utf-8')) <= self.offsets[
+            positions + 1
+        ]
+        return np.unique(positions[inside])
+
+
+def _path_sums(jump, values):
+    '''
+    Sum `values` on the path from each node up to its root (excluding
+    the root) by pointer jumping, `jump` points to the parent of a node
+    or to the node itself for a root, whose value has to be zero.
+
+    Each pass doubles the length of the summed path, therefore it takes
+    only ``log2(depth)`` vectorized passes.
+    '''
+
+    total = values.copy()
+    jump = jump.copy()
+    for _ in range(max(len(jump), 1).bit_length() + 1):
+        ahead = jump[jump]
+        if np.array_equal(ahead, jump):
+            return total
+        total += total[jump]
+        jump = ahead
+    raise Exception('Folders contain a cycle')
+
+
+class TreeSnapshot:
+    '''
+    Whole bookmark tree as parallel arrays indexed by the node position,
+    folders come first, bookmarks second, each in the order they were
+    passed in:
+
+    * ``ids`` - IDs of the items (folders and bookmarks share IDs)
+    * ``kinds`` - `FOLDER` or `BOOKMARK`
+    * ``parent_ids`` - IDs of the parent folders, -1 for the root
+    * ``parents`` - positions of the parent folders, -1 for the root
+    * ``depth`` - number of folders above a node
+    * ``preorder`` - index of a node in pre-order walk, children in
+      the same order as in `frostmark.common.fetch_bookmark_tree`
+    * ``size`` - number of nodes in a subtree including its root
+    * ``titles``, ``urls`` - `StringColumn` of folder names or bookmark
+      titles and bookmark URLs (empty for folders)
+
+    A subtree occupies a continuous range of ``preorder`` indexes,
+    therefore most of the queries are a few vectorized operations.
+    '''
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, folders: list, bookmarks: list, root_id: int = 0):
+        '''
+        Build the snapshot from ``(id, folder_name, parent_folder_id)``
+        folder and ``(id, title, url, folder_id)`` bookmark rows.
+        '''
+
+        require_numpy()
+        count = len(folders) + len(bookmarks)
+        folder_ids = np.array([row[0] for row in folders], dtype=np.int64)
+
+        self.ids = np.concatenate([
+            folder_ids,
+            np.array([row[0] for row in bookmarks], dtype=np.int64)
+        ])
+        self.kinds = np.full(count, BOOKMARK, dtype=np.uint8)
+        self.kinds[:len(folders)] = FOLDER
+        self.titles = StringColumn(
+            [row[1] for row in folders] + [row[1] for row in bookmarks]
+        )
+        self.urls = StringColumn(
+            [''] * len(folders) + [row[2] for row in bookmarks]
+        )
+
+        # the root folder is its own parent in the internal DB
+        self.parent_ids = np.concatenate([
+            np.array([
+                -1 if row[0] == root_id or row[2] is None else row[2]
+                for row in folders
+            ], dtype=np.int64),
+            np.array([row[3] for row in bookmarks], dtype=np.int64)
+        ])
+        self.parents = self._positions(folder_ids, self.parent_ids)
+
+        roots = np.flatnonzero(self.parents < 0)
+        if len(roots) != 1 or self.kinds[roots[0]] != FOLDER:
+            raise Exception(f'Expected a single root folder, got {roots}')
+
+        positions = np.arange(count, dtype=np.int64)
+        jump = np.where(self.parents < 0, positions, self.parents)
+        self.depth = _path_sums(jump, (self.parents >= 0).astype(np.int64))
+        self.size = self._subtree_sizes()
+
+        # offset of a node among the subtrees of its siblings
+        order = np.argsort(self.parents, kind='stable')
+        sizes = self.size[order]
+        preceding = np.cumsum(sizes) - sizes
+        first = np.ones(count, dtype=bool)
+        first[1:] = self.parents[order][1:] != self.parents[order][:-1]
+        offsets = np.empty(count, dtype=np.int64)
+        offsets[order] = preceding - np.maximum.accumulate(
+            np.where(first, preceding, 0)
+        )
+
+        values = offsets + 1
+        values[roots] = 0
+        self.preorder = _path_sums(jump, values)
+
+    @staticmethod
+    def _positions(folder_ids, parent_ids):
+        '''
+        Translate the parent folder IDs to positions of the folders,
+        keep -1 for the root.
+        '''
+
+        order = np.argsort(folder_ids, kind='stable')
+        found = np.searchsorted(folder_ids, parent_ids, sorter=order)
+        found = order[np.minimum(found, max(len(order) - 1, 0))]
+        missing = (parent_ids >= 0) & (folder_ids[found] != parent_ids)
+        if missing.any():
+            raise Exception(
+                f'Missing parent folders: {np.unique(parent_ids[missing])}'
+            )
+        return np.where(parent_ids < 0, -1, found)
+
+    def _subtree_sizes(self):
+        '''
+        Count the nodes in each subtree, one vectorized pass per level
+        from the deepest one up.
+        '''
+
+        size = np.ones(len(self.ids), dtype=np.int64)
+        by_depth = np.argsort(self.depth, kind='stable')
+        bounds = np.searchsorted(
+            self.depth[by_depth], np.arange(self.depth.max() + 2)
+        )
+        for level in range(len(bounds) - 2, 0, -1):
+            nodes = by_depth[bounds[level]:bounds[level + 1]]
+            np.add.at(size, self.parents[nodes], size[nodes])
+        return size
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def order(self):
+        '''
+        Node positions in the pre-order walk of the tree.
+        '''
+        order = np.empty(len(self.ids), dtype=np.int64)
+        order[self.preorder] = np.arange(len(self.ids), dtype=np.int64)
+        return order
+
+    @ensure_annotations
+    def subtree(self, position: int):
+        '''
+        Return the positions of the nodes in a subtree in pre-order.
+        '''
+        start = self.preorder[position]
+        return self.order[start:start + self.size[position]]
+
+    def bookmark_counts(self) -> tuple:
+        '''
+        Return the number of bookmarks directly in each folder
+        and in its whole subtree (zero for bookmarks).
+        '''
+
+        bookmarks = self.kinds == BOOKMARK
+        direct = np.bincount(
+            self.parents[bookmarks], minlength=len(self.ids)
+        )
+        walked = np.concatenate([
+            [0], np.cumsum(bookmarks[self.order], dtype=np.int64)
+        ])
+        total = walked[self.preorder + self.size] - walked[self.preorder]
+        total[bookmarks] = 0
+        return (direct, total)
+
+    @ensure_annotations
+    def find_urls(self, text: str):
+        '''
+        Return the positions of the bookmarks with `text` in their URL.
+        '''
+        found = self.urls.find(text)
+        return found[self.kinds[found] == BOOKMARK]
@@ -3,6 +3,7 @@ Test for creating folder and bookmark trees.
 '''
 import unittest
 from unittest.mock import patch
+from importlib.util import find_spec
 
 
 class TreeTestCase(unittest.TestCase):
@@ -121,7 +122,7 @@ class TreeTestCase(unittest.TestCase):
         Test creating folder tree both nested and flat.
         '''
 
-        from anytree import Node
+        from frostmark.tree import TreeNode
         from frostmark.common import assemble_folder_tree, traverse
         from frostmark.models import Folder
 
@@ -132,7 +133,7 @@ class TreeTestCase(unittest.TestCase):
         )
         flat_tree = traverse(tree)
 
-        self.assertIsInstance(tree, Node)
+        self.assertIsInstance(tree, TreeNode)
         self.assertEqual(tree.id, 0)
 
         # unfold the same way each branch is build from the root
@@ -192,7 +193,7 @@ class TreeTestCase(unittest.TestCase):
         Test creating folder + bookmark tree both nested and flat.
         '''
 
-        from anytree import Node
+        from frostmark.tree import TreeNode
         from frostmark.common import (
             assemble_folder_tree,
             assemble_bookmark_tree,
@@ -214,7 +215,7 @@ class TreeTestCase(unittest.TestCase):
 
         flat_tree = traverse(tree)
 
-        self.assertIsInstance(tree, Node)
+        self.assertIsInstance(tree, TreeNode)
         self.assertEqual(tree.id, 0)
 
         # unfold the same way each as with folders, but make sure bookmarks
@@ -259,7 +260,7 @@ class TreeTestCase(unittest.TestCase):
         ])
 
         for item in flat_tree:
-            if 'folder_name' in vars(item):
+            if hasattr(item, 'folder_name'):
                 self.assertEqual(item.node_type, Folder)
             else:
                 self.assertEqual(item.node_type, Bookmark)
@@ -319,3 +320,185 @@ class TreeTestCase(unittest.TestCase):
             args, _ = item
             self.assertEqual(args[0], expected_calls[idx])
         self.assertEqual(len(output.call_args_list), len(expected_calls))
+
+    @unittest.skipIf(find_spec('anytree') is None, 'anytree is not installed')
+    def test_tree_anytree(self):
+        '''
+        Test rendering the same tree as anytree does via the adapter.
+        '''
+
+        from anytree import RenderTree, AsciiStyle
+        from frostmark.common import (
+            assemble_folder_tree,
+            assemble_bookmark_tree
+        )
+        from frostmark.models import Folder, Bookmark
+        from frostmark.tree import render_tree, to_anytree
+
+        tree = assemble_bookmark_tree(
+            items=self.BOOKMARK_DATA,
+            key='folder_id',
+            folder_tree_root=assemble_folder_tree(
+                items=self.FOLDER_DATA,
+                key='parent_folder_id',
+                node_type=Folder
+            ),
+            node_type=Bookmark
+        )
+
+        self.assertEqual([
+            (pre, node.node_type, node.id)
+            for pre, _, node in RenderTree(
+                to_anytree(tree), style=AsciiStyle()
+            )
+        ], [
+            (pre, node.node_type, node.id)
+            for pre, node in render_tree(tree)
+        ])
+
+    def test_tree_deep(self):
+        '''
+        Test assembling and walking a tree deeper than the recursion limit.
+        '''
+
+        import sys
+        from frostmark.common import assemble_folder_tree, traverse
+        from frostmark.models import Folder
+        from frostmark.tree import render_tree
+
+        depth = sys.getrecursionlimit() * 2
+        tree = assemble_folder_tree(
+            items=[{
+                'id': idx,
+                'folder_name': str(idx),
+                'parent_folder_id': idx - 1 if idx else None
+            } for idx in range(depth)],
+            key='parent_folder_id',
+            node_type=Folder
+        )
+
+        self.assertEqual(
+            [node.id for node in traverse(tree)], list(range(depth))
+        )
+        self.assertEqual(
+            [len(pre) for pre, _ in render_tree(tree)][-2:],
+            [(depth - 2) * 4, (depth - 1) * 4]
+        )
+
+    @unittest.skipIf(find_spec('numpy') is None, 'NumPy is not installed')
+    def test_tree_snapshot(self):
+        '''
+        Test computing the same tree structure as with the tree nodes
+        in the columnar snapshot.
+        '''
+
+        from frostmark.common import (
+            assemble_folder_tree,
+            assemble_bookmark_tree,
+            traverse
+        )
+        from frostmark.models import Folder, Bookmark
+        from frostmark.snapshot import TreeSnapshot, FOLDER, BOOKMARK
+
+        tree = assemble_bookmark_tree(
+            items=self.BOOKMARK_DATA,
+            key='folder_id',
+            folder_tree_root=assemble_folder_tree(
+                items=self.FOLDER_DATA,
+                key='parent_folder_id',
+                node_type=Folder
+            ),
+            node_type=Bookmark
+        )
+        snapshot = TreeSnapshot(
+            folders=[
+                (item['id'], item['folder_name'], item['parent_folder_id'])
+                for item in self.FOLDER_DATA
+            ],
+            bookmarks=[
+                (item['id'], item['title'], item['url'], item['folder_id'])
+                for item in self.BOOKMARK_DATA
+            ]
+        )
+        kinds = {Folder: FOLDER, Bookmark: BOOKMARK}
+
+        def depth(node):
+            return 0 if node.parent is None else depth(node.parent) + 1
+
+        nodes = traverse(tree)
+        order = snapshot.order
+        self.assertEqual(len(snapshot), len(nodes))
+        self.assertEqual([
+            (kinds[node.node_type], node.id, depth(node), len(traverse(node)))
+            for node in nodes
+        ], [
+            (
+                snapshot.kinds[pos], snapshot.ids[pos],
+                snapshot.depth[pos], snapshot.size[pos]
+            )
+            for pos in order
+        ])
+        self.assertEqual(
+            [snapshot.titles[pos] for pos in order],
+            [getattr(node, 'folder_name', None) or node.title
+             for node in nodes]
+        )
+
+        # folder "five" (ID 5) is the sixth folder
+        self.assertEqual(
+            [snapshot.ids[pos] for pos in snapshot.subtree(5)],
+            [5, 6, 7, 14, 13, 12]
+        )
+        direct, total = snapshot.bookmark_counts()
+        self.assertEqual((direct[0], total[0]), (3, 14))
+        self.assertEqual((direct[5], total[5]), (1, 3))
+        self.assertEqual(total[snapshot.kinds == BOOKMARK].sum(), 0)
+
+        self.assertEqual(len(snapshot.find_urls('<url>')), 14)
+        # matches only spanning over multiple URLs
+        self.assertEqual(len(snapshot.find_urls('><')), 0)
+
+    def test_tree_build(self):
+        '''
+        Test building a tree from the projected rows in one pass,
+        bookmark rows may come before their folders.
+        '''
+
+        from frostmark.common import (
+            build_tree, traverse, FOLDER_ROW, BOOKMARK_ROW
+        )
+        from frostmark.models import Folder, Bookmark
+
+        rows = [(
+            BOOKMARK_ROW, item['id'], item['title'], item['folder_id'],
+            item['url'], 'hash' if item['id'] == 1 else None,
+            b'inline' if item['id'] == 2 else None
+        ) for item in self.BOOKMARK_DATA] + [(
+            # the root folder is its own parent in the internal DB
+            FOLDER_ROW, item['id'], item['folder_name'],
+            item['parent_folder_id'] or 0, None, None, None
+        ) for item in self.FOLDER_DATA]
+
+        tree = build_tree(rows, {'hash': b'data:'})
+        flat_tree = traverse(tree)
+        self.assertEqual(tree.id, 0)
+        self.assertIsNone(tree.parent_folder_id)
+        self.assertEqual([item.id for item in flat_tree], [
+            0, 1, 2, 7, 3, 8, 9, 10,
+            4, 5, 6, 4, 11, 5, 6, 7,
+            14, 13, 12, 1, 2, 3
+        ])
+
+        bookmarks = {
+            item.id: item
+            for item in flat_tree
+            if item.node_type == Bookmark
+        }
+        self.assertEqual(len(bookmarks), len(self.BOOKMARK_DATA))
+        self.assertEqual(bookmarks[1].icon, b'data:')
+        self.assertEqual(bookmarks[2].icon, b'inline')
+        self.assertEqual(bookmarks[3].icon, b'')
+        self.assertEqual(bookmarks[14].parent.folder_name, 'seven')
+        for item in flat_tree:
+            if item.node_type == Folder:
+                self.assertFalse(hasattr(item, 'url'))
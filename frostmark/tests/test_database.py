@@ -24,7 +24,7 @@ class DBBaseTestCase(unittest.TestCase):
         folder = dirname(abspath(user_data.__file__))
         self.assertEqual(db_base.DB_PATH, join(folder, db_base.DB_NAME))
         self.assertEqual(
-            str(db_base.ENGINE.url).replace('sqlite:///', ''),
+            str(db_base.get_engine().url).replace('sqlite:///', ''),
             db_base.DB_PATH
         )
         self.assertNotIn(db_base.DB_NAME, listdir(folder))
@@ -41,7 +41,7 @@ class DBBaseTestCase(unittest.TestCase):
         folder = dirname(abspath(user_data.__file__))
         self.assertNotIn(db_base.DB_NAME, listdir(folder))
 
-        db_base.BASE.metadata.create_all(db_base.ENGINE)
+        db_base.BASE.metadata.create_all(db_base.get_engine())
         ses = db_base.SESSIONMAKER()
         ses.close()
 
@@ -75,3 +75,335 @@ class DBBaseTestCase(unittest.TestCase):
 
         self.assertIn(db_base.DB_NAME, listdir(folder))
         remove(join(folder, db_base.DB_NAME))
+
+    def test_db_add_columns(self):
+        '''
+        Test adding new columns to a DB created by an older version.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session
+        from frostmark.models import Bookmark
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        with db_base.get_engine().begin() as conn:
+            conn.execute(
+                'CREATE TABLE bookmark ('
+                'id INTEGER NOT NULL PRIMARY KEY, title VARCHAR NOT NULL, '
+                'url VARCHAR NOT NULL, icon BLOB NOT NULL, '
+                'folder_id INTEGER NOT NULL)'
+            )
+            conn.execute(
+                "INSERT INTO bookmark VALUES (1, 'old', 'url', X'', 0)"
+            )
+
+        session = get_session()
+        bookmark = session.query(Bookmark).one()
+        self.assertEqual(bookmark.title, 'old')
+        self.assertIsNone(bookmark.icon_hash)
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_move_inline_icons(self):
+        '''
+        Test moving icons stored inline by an older version into the icon
+        store and not loading the icon column unless asked for.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session
+        from frostmark.models import Bookmark, Icon
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        with db_base.get_engine().begin() as conn:
+            conn.execute(
+                'CREATE TABLE bookmark ('
+                'id INTEGER NOT NULL PRIMARY KEY, title VARCHAR NOT NULL, '
+                'url VARCHAR NOT NULL, icon BLOB NOT NULL, '
+                'folder_id INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'INSERT INTO bookmark VALUES (?, ?, ?, ?, ?)', [
+                    (1, 'one', 'url', b'data:image/png;base64,aWNvbg==', 0),
+                    (2, 'two', 'url', b'data:image/png;base64,aWNvbg==', 0),
+                    (3, 'link', 'url', b'http://icon', 0),
+                    (4, 'none', 'url', b'', 0)
+                ]
+            )
+
+        session = get_session()
+        icon = session.query(Icon).one()
+        self.assertEqual((icon.mime, icon.data), ('image/png', b'icon'))
+
+        bookmarks = session.query(Bookmark).order_by(Bookmark.id).all()
+        for bookmark in bookmarks:
+            self.assertNotIn('icon', vars(bookmark))
+        self.assertEqual(
+            [(item.icon_hash, item.icon) for item in bookmarks], [
+                (icon.hash, b''), (icon.hash, b''),
+                (None, b'http://icon'), (None, b'')
+            ]
+        )
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_upgrade_indexes(self):
+        '''
+        Test creating the indexes missing in a DB created by an older
+        version and storing the schema version.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session, SCHEMA_VERSION
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        with db_base.get_engine().begin() as conn:
+            conn.execute(
+                'CREATE TABLE folder ('
+                'id INTEGER NOT NULL PRIMARY KEY, '
+                'folder_name VARCHAR NOT NULL, '
+                'parent_folder_id INTEGER NOT NULL)'
+            )
+
+        get_session().close()
+        # already upgraded
+        get_session().close()
+
+        with db_base.get_engine().connect() as conn:
+            self.assertEqual(
+                conn.execute('PRAGMA user_version').scalar(), SCHEMA_VERSION
+            )
+            self.assertEqual(
+                sorted(row[1] for row in conn.execute(
+                    "SELECT * FROM sqlite_master WHERE type = 'index' "
+                    "AND name LIKE 'ix_%'"
+                )),
+                [
+                    'ix_bookmark_folder_id', 'ix_bookmark_url',
+                    'ix_folder_parent_folder_id'
+                ]
+            )
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_query_plan(self):
+        '''
+        Test looking up children and URLs with an index, not a table scan.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session
+        from frostmark.models import Folder, Bookmark
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        session = get_session()
+        queries = {
+            'ix_folder_parent_folder_id': session.query(Folder).filter(
+                Folder.parent_folder_id == 0
+            ),
+            'ix_bookmark_folder_id': session.query(Bookmark).filter(
+                Bookmark.folder_id == 0
+            ),
+            'ix_bookmark_url': session.query(Bookmark).filter(
+                Bookmark.url == 'url'
+            )
+        }
+        for index, query in queries.items():
+            statement = query.statement.compile(
+                compile_kwargs={'literal_binds': True}
+            )
+            plan = ' '.join(
+                row[-1] for row in session.execute(
+                    f'EXPLAIN QUERY PLAN {statement}'
+                )
+            )
+            self.assertIn(f'USING INDEX {index}', plan)
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_session_bootstrap_once(self):
+        '''
+        Test creating the schema only for a new DB, not for each session.
+        '''
+
+        from unittest.mock import patch
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session
+        from frostmark.models import Folder
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        session = get_session()
+        self.assertEqual(session.query(Folder).count(), 1)
+        session.close()
+
+        with patch.object(db_base.BASE.metadata, 'create_all') as create:
+            get_session().close()
+            create.assert_not_called()
+
+        # removed DB is bootstrapped again
+        remove(join(folder, db_base.DB_NAME))
+        session = get_session()
+        self.assertEqual(session.query(Folder).count(), 1)
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_session_scope(self):
+        '''
+        Test committing a session scope or rolling it back on exception.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session, session_scope
+        from frostmark.models import Folder
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        with session_scope() as session:
+            session.add(Folder(id=1, folder_name='kept'))
+
+        with self.assertRaises(Exception):
+            with session_scope() as session:
+                session.add(Folder(id=2, folder_name='dropped'))
+                session.flush()
+                raise Exception('Failed')
+
+        session = get_session()
+        self.assertEqual(
+            [item.folder_name for item in session.query(Folder).filter(
+                Folder.id != 0
+            )],
+            ['kept']
+        )
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_generation(self):
+        '''
+        Test changing the DB generation on each write of folders
+        and bookmarks and for a new DB at the same path.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session, get_generation
+        from frostmark.models import Folder, Bookmark, ImportSource
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        session = get_session()
+        token, value = get_generation(session)
+
+        session.add(Folder(id=1, folder_name='folder'))
+        session.add(Bookmark(id=1, title='title', url='url', folder_id=1))
+        session.commit()
+        self.assertEqual(get_generation(session), (token, value + 2))
+
+        session.query(Bookmark).filter(Bookmark.id == 1).update(
+            {'title': 'renamed'}
+        )
+        session.query(Bookmark).filter(Bookmark.id == 1).delete()
+        session.commit()
+        self.assertEqual(get_generation(session), (token, value + 4))
+
+        # unrelated tables are not a part of the tree
+        session.add(ImportSource(backend='chrome', path='path'))
+        session.commit()
+        self.assertEqual(get_generation(session), (token, value + 4))
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+        session = get_session()
+        self.assertNotEqual(get_generation(session)[0], token)
+        session.close()
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_pragmas(self):
+        '''
+        Test selecting and overriding the pragmas of a DB profile.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db_base import get_pragmas, DB_PROFILES
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        self.assertEqual(get_pragmas({}), DB_PROFILES['fast'])
+        self.assertEqual(
+            get_pragmas({
+                'FROSTMARK_DB_PROFILE': 'durable',
+                'FROSTMARK_DB_BUSY_TIMEOUT': '100'
+            }),
+            {**DB_PROFILES['durable'], 'busy_timeout': '100'}
+        )
+        with self.assertRaises(Exception):
+            get_pragmas({'FROSTMARK_DB_PROFILE': 'unknown'})
+        with self.assertRaises(Exception):
+            get_pragmas({'FROSTMARK_DB_SYNCHRONOUS': 'OFF; DROP TABLE x'})
+
+        with db_base.get_engine().connect() as conn:
+            self.assertEqual(
+                conn.execute('PRAGMA journal_mode').scalar(), 'wal'
+            )
+            self.assertEqual(
+                conn.execute('PRAGMA busy_timeout').scalar(),
+                int(db_base.PRAGMAS['busy_timeout'])
+            )
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_db_memory(self):
+        '''
+        Test keeping the DB in memory shared by all of the sessions.
+        '''
+
+        from frostmark import user_data
+        from frostmark import db_base
+        from frostmark.db import get_session
+        from frostmark.models import Folder
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        original = db_base.DB_PATH
+        db_base.use_database(db_base.MEMORY)
+        try:
+            session = get_session()
+            session.add(Folder(id=1, folder_name='memory'))
+            session.commit()
+            session.close()
+
+            session = get_session()
+            self.assertEqual(
+                session.query(Folder).get(1).folder_name, 'memory'
+            )
+            session.close()
+        finally:
+            db_base.use_database(original)
+
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
@@ -475,3 +475,88 @@ class EditTestCase(unittest.TestCase):
 
         self.assertIn(db_base.DB_NAME, listdir(data))
         remove(join(data, db_base.DB_NAME))
+
+    def test_edit_events(self):
+        '''
+        Test emitting the change events and patching a tree in memory
+        with them to the same tree as fetched from the DB.
+        '''
+        from frostmark import db_base, user_data
+        from frostmark.cache import TreeHolder
+        from frostmark.common import fetch_bookmark_tree, json_bookmark_tree
+        from frostmark.db import get_session
+        from frostmark.models import Folder
+        from frostmark.editor import Editor
+        from frostmark.editor.events import (
+            MOVE, RENAME, URL_CHANGE, INSERT, DELETE
+        )
+
+        data = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(data))
+
+        events = []
+        fetches = []
+        holder = TreeHolder(
+            fetch=lambda: fetches.append(1) or fetch_bookmark_tree()
+        )
+        holder.get()
+
+        Editor.subscribe(events.append)
+        Editor.subscribe(holder.apply)
+        try:
+            first = Editor.add_folder(parent_id=0, name='first')
+            second = Editor.add_folder(parent_id=0, name='second')
+            bookmark = Editor.add_bookmark(
+                parent_id=0, name='title', url='url'
+            )
+            Editor.change_parent_folder(folder_id=second, parent_id=first)
+            Editor.change_parent_bookmark(
+                bookmark_id=bookmark, parent_id=second
+            )
+            Editor.rename_folder(folder_id=first, name='renamed')
+            Editor.rename_bookmark(bookmark_id=bookmark, name='renamed')
+            Editor.change_bookmark_url(bookmark_id=bookmark, url='changed')
+
+            self.assertEqual(
+                holder.read(json_bookmark_tree),
+                json_bookmark_tree(fetch_bookmark_tree())
+            )
+            self.assertEqual(len(fetches), 1)
+
+            with self.assertRaises(Exception):
+                Editor.remove_folder(folder_id=first)
+
+            # a change made without the editor can't be patched
+            session = get_session()
+            session.query(Folder).filter(Folder.id == first).update(
+                {'folder_name': 'outside'}
+            )
+            session.commit()
+            session.close()
+            Editor.remove_bookmark(bookmark_id=bookmark)
+            self.assertEqual(holder.get().children[0].folder_name, 'outside')
+            self.assertEqual(len(fetches), 2)
+
+            Editor.remove_folder(folder_id=second)
+            self.assertEqual(
+                holder.read(json_bookmark_tree),
+                json_bookmark_tree(fetch_bookmark_tree())
+            )
+            self.assertEqual(len(fetches), 2)
+        finally:
+            Editor.unsubscribe(events.append)
+            Editor.unsubscribe(holder.apply)
+
+        self.assertEqual(
+            [(event.action, event.item_id) for event in events], [
+                (INSERT, first), (INSERT, second), (INSERT, bookmark),
+                (MOVE, second), (MOVE, bookmark),
+                (RENAME, first), (RENAME, bookmark), (URL_CHANGE, bookmark),
+                (DELETE, bookmark), (DELETE, second)
+            ]
+        )
+        for previous, event in zip(events[:7], events[1:8]):
+            self.assertEqual(previous.after, event.before)
+        self.assertNotEqual(events[7].after, events[8].before)
+
+        remove(join(data, db_base.DB_NAME))
@@ -0,0 +1,202 @@
+'''
+Test for the web application wrapping the CLI.
+'''
+import unittest
+from os import listdir, remove
+from os.path import join, abspath, dirname
+
+
+class GuiTestCase(unittest.TestCase):
+    '''
+    TestCase for the API of the web application.
+    '''
+
+    def test_gui_icon(self):
+        '''
+        Test serving icons by their hash outside of the bookmark tree.
+        '''
+
+        import json
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.icons import hash_icon
+        from frostmark.models import Bookmark, Icon
+        from frostmark.core.gui.react import APP
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        data = b'\x89PNG\r\n\x1a\nicon'
+        icon_hash = hash_icon(data)
+        session = get_session()
+        session.add(Icon(hash=icon_hash, mime='image/png', data=data))
+        session.add(Bookmark(
+            title='title', url='url', folder_id=0, icon_hash=icon_hash
+        ))
+        session.commit()
+        session.close()
+
+        client = APP.test_client()
+        tree = json.loads(client.get('/api/list_tree').data)
+        bookmark = [
+            item for item in tree if item['node_type'] == 'Bookmark'
+        ][0]
+        self.assertEqual(bookmark['icon_hash'], icon_hash)
+        self.assertEqual(bookmark['icon'], '')
+
+        response = client.get(f'/api/icon/{icon_hash}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, data)
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertEqual(response.headers['ETag'], f'"{icon_hash}"')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('sandbox', response.headers['Content-Security-Policy'])
+        self.assertEqual(
+            response.headers['X-Content-Type-Options'], 'nosniff'
+        )
+
+        response = client.get(
+            f'/api/icon/{icon_hash}',
+            headers={'If-None-Match': f'"{icon_hash}"'}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        response = client.get('/api/icon/missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            response.headers['Access-Control-Allow-Origin'], '*'
+        )
+        self.assertNotIn('Cache-Control', response.headers)
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_gui_cache(self):
+        '''
+        Test building the bookmark tree only once for an unchanged DB,
+        patching it after an edit and fetching it again after a change
+        made without the editor.
+        '''
+
+        import json
+        from unittest.mock import patch
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.cache import HOLDER
+        from frostmark.common import fetch_bookmark_tree
+        from frostmark.db import get_session
+        from frostmark.editor import Editor
+        from frostmark.models import Bookmark
+        from frostmark.core.gui.react import APP
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        session = get_session()
+        session.add(Bookmark(id=1, title='title', url='url', folder_id=0))
+        session.commit()
+        session.close()
+
+        client = APP.test_client()
+        with patch.object(
+                HOLDER, 'fetch', wraps=fetch_bookmark_tree
+        ) as fetch:
+            first = client.get('/api/list_tree').data
+            self.assertEqual(client.get('/api/list_tree').data, first)
+            self.assertEqual(fetch.call_count, 1)
+
+            Editor.rename_bookmark(bookmark_id=1, name='renamed')
+            tree = json.loads(client.get('/api/list_tree').data)
+            self.assertEqual(fetch.call_count, 1)
+            self.assertEqual(tree[-1]['title'], 'renamed')
+
+            session = get_session()
+            session.add(Bookmark(id=2, title='added', url='url'))
+            session.commit()
+            session.close()
+            tree = json.loads(client.get('/api/list_tree').data)
+            self.assertEqual(fetch.call_count, 2)
+            self.assertEqual(tree[-1]['title'], 'added')
+
+        self.assertEqual(
+            client.get('/api/list_folders').data,
+            client.get('/api/list_folders').data
+        )
+        self.assertIn(
+            b'renamed', client.get('/api/export_bookmarks').data
+        )
+
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_gui_import_upload(self):
+        '''
+        Test uploading different profiles with the same file name, without
+        a profile label the items are only added, with a label a repeated
+        upload updates the same items instead of duplicating them.
+        '''
+
+        import json
+        from io import BytesIO
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Bookmark, ImportSource
+        from frostmark.core.gui.react import APP
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        with open(join(
+                dirname(abspath(__file__)), 'sample_chrome.json'
+        ), 'rb') as fsample:
+            first = fsample.read()
+        second = json.dumps({'roots': {'bookmark_bar': {
+            'type': 'folder', 'id': '1', 'name': 'Bar', 'children': [{
+                'type': 'url', 'id': '2', 'name': 'OnlyInB',
+                'url': 'https://b.example', 'guid': 'b'
+            }]
+        }}}).encode('utf-8')
+
+        client = APP.test_client()
+
+        def upload(content, profile=None):
+            data = {
+                'browser': 'chrome',
+                'file': (BytesIO(content), 'Bookmarks')
+            }
+            if profile:
+                data['profile'] = profile
+            response = client.post('/api/import_bookmarks', data=data)
+            self.assertEqual(response.status_code, 301)
+
+            session = get_session()
+            try:
+                return (
+                    sorted(item.title for item in session.query(Bookmark)),
+                    [item.path for item in session.query(ImportSource)]
+                )
+            finally:
+                session.close()
+
+        titles, sources = upload(first)
+        self.assertEqual(len(titles), 4)
+        self.assertEqual(sources, [])
+
+        titles, sources = upload(second)
+        self.assertEqual(len(titles), 5)
+        self.assertIn('OnlyInB', titles)
+        self.assertEqual(sources, [])
+
+        # labeled profiles, each of them only once
+        for _ in range(2):
+            titles, sources = upload(first, profile='work')
+            self.assertEqual(len(titles), 9)
+            self.assertEqual(sources, ['upload:work'])
+
+        titles, sources = upload(second, profile='home')
+        self.assertEqual(len(titles), 10)
+        self.assertEqual(titles.count('OnlyInB'), 2)
+        self.assertEqual(sources, ['upload:work', 'upload:home'])
+
+        remove(join(folder, db_base.DB_NAME))
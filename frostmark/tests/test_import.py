@@ -6,6 +6,8 @@ import unittest
 from unittest.mock import patch
 from os import listdir, remove
 from os.path import join, abspath, dirname
+from contextlib import closing
+from importlib.util import find_spec
 
 
 class ImportTestCase(unittest.TestCase):
@@ -18,7 +20,7 @@ class ImportTestCase(unittest.TestCase):
         Test fetching Firefox profiles from places.sqlite.
         '''
 
-        from anytree import Node
+        from frostmark.tree import TreeNode
         from frostmark.common import traverse
         from frostmark.models import Folder, Bookmark
         from frostmark.importer import Importer
@@ -34,7 +36,7 @@ class ImportTestCase(unittest.TestCase):
         tree = FirefoxImporter.assemble_import_tree(session)
         flat_tree = traverse(tree)
 
-        self.assertIsInstance(tree, Node)
+        self.assertIsInstance(tree, TreeNode)
 
         self.maxDiff = None  # pylint: disable=invalid-name
         self.assertEqual([
@@ -134,7 +136,7 @@ class ImportTestCase(unittest.TestCase):
         Test fetching Opera profile.
         '''
 
-        from anytree import Node
+        from frostmark.tree import TreeNode
         from frostmark.common import traverse
         from frostmark.models import Folder, Bookmark
         from frostmark.importer.opera import OperaImporter
@@ -148,7 +150,7 @@ class ImportTestCase(unittest.TestCase):
         tree = OperaImporter.assemble_import_tree(sample)
         flat_tree = traverse(tree)
 
-        self.assertIsInstance(tree, Node)
+        self.assertIsInstance(tree, TreeNode)
 
         self.maxDiff = None  # pylint: disable=invalid-name
         self.assertEqual([
@@ -279,7 +281,7 @@ class ImportTestCase(unittest.TestCase):
         Test fetching Chrome profile.
         '''
 
-        from anytree import Node
+        from frostmark.tree import TreeNode
         from frostmark.common import traverse
         from frostmark.models import Folder, Bookmark
         from frostmark.importer.chrome import ChromeImporter
@@ -293,7 +295,7 @@ class ImportTestCase(unittest.TestCase):
         tree = ChromeImporter.assemble_import_tree(sample)
         flat_tree = traverse(tree)
 
-        self.assertIsInstance(tree, Node)
+        self.assertIsInstance(tree, TreeNode)
 
         self.maxDiff = None  # pylint: disable=invalid-name
         self.assertEqual([
@@ -317,6 +319,30 @@ class ImportTestCase(unittest.TestCase):
             ('Záložky v mobile', Folder)
         ])
 
+    def test_pull_chrome_custom_root(self):
+        '''
+        Test walking the nested `custom_root` folders with Chrome importer
+        the same way as with Opera importer in both parsing modes.
+        '''
+
+        from frostmark.common import traverse
+        from frostmark.importer.chrome import ChromeImporter
+        from frostmark.importer.opera import OperaImporter
+
+        def flatten(tree):
+            return [(
+                item.node_type, item.id,
+                item.parent.id if item.parent else None
+            ) for item in traverse(tree)]
+
+        sample = join(dirname(abspath(__file__)), 'sample_opera.json')
+        expected = flatten(OperaImporter.assemble_import_tree(sample))
+        self.assertEqual(len(expected), 29)
+        for stream in (False, True):
+            self.assertEqual(flatten(ChromeImporter.assemble_import_tree(
+                sample, stream=stream
+            )), expected)
+
     def test_import_chrome(self):
         '''
         Test importing bookmark tree into internal DB.
@@ -369,3 +395,831 @@ class ImportTestCase(unittest.TestCase):
 
         # remove internal DB
         remove(join(folder, db_base.DB_NAME))
+
+    def test_sort_folders(self):
+        '''
+        Test sorting folders with a child ID lower than its parent ID.
+        '''
+
+        from frostmark.importer import Importer
+
+        folders = [
+            {'id': 5, 'parent_folder_id': None},
+            {'id': 2, 'parent_folder_id': 9},
+            {'id': 9, 'parent_folder_id': 5},
+            {'id': 1, 'parent_folder_id': 2},
+            {'id': 7, 'parent_folder_id': 5}
+        ]
+
+        # pylint: disable=protected-access
+        self.assertEqual(
+            [folder['id'] for folder in Importer._sort_folders(folders)],
+            [5, 9, 7, 2, 1]
+        )
+
+        # dangling child, parent is missing
+        with self.assertRaises(Exception):
+            Importer._sort_folders(folders[1:])
+
+        # parent is already imported
+        self.assertEqual([
+            folder['id'] for folder in Importer._sort_folders(
+                folders[1:], known={5: 123}
+            )
+        ], [9, 7, 2, 1])
+
+    def test_import_chunked(self):
+        '''
+        Test importing bookmark tree into internal DB in small chunks.
+        '''
+
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Folder, Bookmark
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        # chunk size not aligned with the count of rows
+        Importer('opera', chunk_size=5).import_from(join(
+            dirname(abspath(__file__)),
+            'sample_opera.json'
+        ))
+
+        session = get_session()
+        try:
+            self.assertEqual(session.query(Folder).count(), 13)
+            self.assertEqual(session.query(Bookmark).count(), 17)
+            self.assertEqual(
+                session.query(Bookmark).filter(
+                    Bookmark.title == 'Wikipedia'
+                ).first().folder.folder_name,
+                ''
+            )
+        finally:
+            session.close()
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_import_chunked_writer(self):
+        '''
+        Test inserting items by another writer between the committed chunks
+        of an import, the IDs of each chunk are assigned only after that.
+        '''
+
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.editor import Editor
+        from frostmark.models import Folder, Bookmark
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        def progress(_):
+            Editor.add_bookmark(
+                parent_id=Editor.add_folder(parent_id=0, name='editor'),
+                name='editor', url='url'
+            )
+
+        Importer('opera', chunk_size=5).import_from(join(
+            dirname(abspath(__file__)),
+            'sample_opera.json'
+        ), progress=progress)
+
+        session = get_session()
+        try:
+            added = session.query(Folder).filter(
+                Folder.folder_name == 'editor'
+            ).count()
+            self.assertGreater(added, 1)
+            self.assertEqual(session.query(Folder).count(), 13 + added)
+            self.assertEqual(session.query(Bookmark).count(), 17 + added)
+            self.assertEqual(
+                session.query(Bookmark).filter(
+                    Bookmark.title == 'Wikipedia'
+                ).first().folder.folder_name,
+                ''
+            )
+        finally:
+            session.close()
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_pull_stream(self):
+        '''
+        Test incremental parsing of Chrome and Opera profiles
+        produces the same tree as decoding the whole JSON at once.
+        '''
+
+        from json import JSONDecodeError
+        from frostmark.common import traverse, assemble_record_tree
+        from frostmark.importer import stream
+        from frostmark.importer.chrome import ChromeImporter
+        from frostmark.importer.opera import OperaImporter
+
+        def flatten(tree):
+            return [(
+                item.node_type, item.id,
+                item.parent.id if item.parent else None,
+                getattr(item, 'folder_name', getattr(item, 'title', None))
+            ) for item in traverse(tree)]
+
+        for backend, name in ((ChromeImporter, 'chrome'),
+                              (OperaImporter, 'opera')):
+            sample = join(dirname(abspath(__file__)), f'sample_{name}.json')
+            expected = flatten(backend.assemble_import_tree(sample))
+
+            self.assertEqual(flatten(backend.assemble_import_tree(
+                sample, stream=True
+            )), expected)
+
+            # tokens, strings and escapes split between the chunks
+            self.assertEqual(flatten(assemble_record_tree(
+                stream.iter_records(
+                    sample, roots=backend.ROOTS,
+                    nested_roots=backend.NESTED_ROOTS, chunk_size=3
+                )
+            )), expected)
+
+        # events ending inside of a value
+        with self.assertRaises(JSONDecodeError):
+            stream.skip_value(iter([('start_map', None)]), 'start_map')
+
+    def test_pull_chromium_deep(self):
+        '''
+        Test walking deeply nested folders of a Chromium-based profile
+        without hitting the recursion limit.
+        '''
+
+        from sys import getrecursionlimit
+        from frostmark.models import Folder, Bookmark
+        from frostmark.importer.chromium import ChromiumImporter
+
+        depth = getrecursionlimit() * 2
+        folder = {'id': str(depth + 1), 'type': 'url', 'name': '', 'url': 'x'}
+        for idx in reversed(range(1, depth + 1)):
+            folder = {
+                'id': str(idx), 'type': 'folder',
+                'name': str(idx), 'children': [folder]
+            }
+
+        records = list(ChromiumImporter.walk({'roots': {'other': folder}}))
+        self.assertEqual(len(records), depth + 2)
+        self.assertEqual(
+            records[-1],
+            (Bookmark, {
+                'id': depth + 1, 'guid': str(depth + 1), 'title': 'x',
+                'folder_id': depth, 'url': 'x'
+            })
+        )
+        self.assertEqual(
+            [item['parent_folder_id'] for _, item in records[:3]],
+            [None, 0, 1]
+        )
+        self.assertTrue(all(
+            node_type == Folder for node_type, _ in records[:-1]
+        ))
+
+    def test_pull_firefox_raw(self):
+        '''
+        Test fetching Firefox profile via read-only sqlite3 connection
+        while the database is locked.
+        '''
+
+        import sqlite3
+        from shutil import copyfile
+        from tempfile import TemporaryDirectory
+        from frostmark.common import traverse, assemble_record_tree
+        from frostmark.importer import Importer
+        from frostmark.importer.firefox import FirefoxImporter
+
+        def flatten(tree):
+            return [(
+                item.node_type, item.id,
+                item.parent.id if item.parent else None,
+                getattr(item, 'folder_name', getattr(item, 'title', None))
+            ) for item in traverse(tree)]
+
+        sample = join(
+            dirname(abspath(__file__)),
+            'sample_firefox.sqlite'
+        )
+
+        # pylint: disable=protected-access
+        session = Importer._path_session(sample, FirefoxImporter.BASE)
+        expected = flatten(FirefoxImporter.assemble_import_tree(session))
+        session.close()
+
+        # lock the database the same way as running Firefox does,
+        # use a copy because the sample might be opened by other tests
+        with TemporaryDirectory() as temp:
+            locked = join(temp, 'places.sqlite')
+            copyfile(sample, locked)
+
+            lock = sqlite3.connect(locked)
+            try:
+                lock.execute('PRAGMA locking_mode=EXCLUSIVE')
+                lock.execute('BEGIN EXCLUSIVE')
+                with self.assertRaises(sqlite3.OperationalError):
+                    sqlite3.connect(locked, timeout=0).execute(
+                        'SELECT * FROM moz_bookmarks'
+                    )
+
+                self.assertEqual(flatten(assemble_record_tree(
+                    FirefoxImporter.iter_records(locked)
+                )), expected)
+            finally:
+                lock.rollback()
+                lock.close()
+
+    def test_reimport_firefox(self):
+        '''
+        Test importing only the changes from an already imported
+        Firefox profile.
+        '''
+        # pylint: disable=too-many-locals
+
+        import sqlite3
+        from shutil import copyfile
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Folder, Bookmark, ImportItem
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        def counts():
+            session = get_session()
+            try:
+                return (
+                    session.query(Folder).count(),
+                    session.query(Bookmark).count(),
+                    session.query(ImportItem).count()
+                )
+            finally:
+                session.close()
+
+        with TemporaryDirectory() as temp:
+            places = join(temp, 'places.sqlite')
+            copyfile(join(
+                dirname(abspath(__file__)),
+                'sample_firefox.sqlite'
+            ), places)
+
+            Importer('firefox').import_from(places)
+            self.assertEqual(counts(), (8, 9, 16))
+
+            # nothing changed, nothing duplicated
+            Importer('firefox').import_from(places)
+            self.assertEqual(counts(), (8, 9, 16))
+
+            # rename, add and remove a bookmark as Firefox does
+            with closing(sqlite3.connect(places)) as conn, conn:
+                later = 1500000000000000
+                conn.execute(
+                    'UPDATE moz_bookmarks SET title = ?, lastModified = ? '
+                    'WHERE id = ?', ('Renamed', later, 14)
+                )
+                conn.execute(
+                    'INSERT INTO moz_bookmarks '
+                    '(type, fk, parent, title, dateAdded, lastModified) '
+                    'VALUES (1, 1, 7, ?, ?, ?)', ('New', later, later)
+                )
+                conn.execute('DELETE FROM moz_bookmarks WHERE id = 16')
+                conn.execute(
+                    'UPDATE moz_bookmarks SET lastModified = ? '
+                    'WHERE id IN (2, 7)', (later, )
+                )
+
+            Importer('firefox').import_from(places)
+            self.assertEqual(counts(), (8, 9, 16))
+
+            session = get_session()
+            try:
+                titles = {
+                    item.title: item.folder.folder_name
+                    for item in session.query(Bookmark).all()
+                }
+            finally:
+                session.close()
+
+        self.assertEqual(titles['Renamed'], 'Bookmarks Toolbar')
+        self.assertEqual(titles['New'], 'Latest Headlines')
+        self.assertNotIn('Most Visited', titles)
+        self.assertNotIn('Recent Tags', titles)
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_reimport_chrome(self):
+        '''
+        Test re-importing Chrome profile through the identity map
+        by GUIDs even if the native IDs have changed.
+        '''
+
+        import json
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Folder, Bookmark
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        def profile(path, offset, names):
+            books = [{
+                'id': str(offset + idx), 'guid': f'book-{idx}',
+                'type': 'url', 'name': name, 'url': f'http://{idx}'
+            } for idx, name in enumerate(names)]
+            with open(path, 'w') as fbookmarks:
+                json.dump({'roots': {'bookmark_bar': {
+                    'id': str(offset + 10), 'guid': 'bar',
+                    'type': 'folder', 'name': 'bar', 'children': books
+                }}}, fbookmarks)
+
+        def titles():
+            session = get_session()
+            try:
+                self.assertEqual(session.query(Folder).count(), 3)
+                return sorted(
+                    item.title for item in session.query(Bookmark).all()
+                )
+            finally:
+                session.close()
+
+        with TemporaryDirectory() as temp:
+            path = join(temp, 'Bookmarks')
+            profile(path, offset=0, names=('old', 'kept', 'gone'))
+            Importer('chrome').import_from(path)
+            Importer('chrome').import_from(path)
+            self.assertEqual(titles(), ['gone', 'kept', 'old'])
+
+            # renumbered (e.g. by sync), renamed and removed
+            profile(path, offset=100, names=('new', 'kept'))
+            Importer('chrome').import_from(path)
+            self.assertEqual(titles(), ['kept', 'new'])
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_reimport_edited(self):
+        '''
+        Test re-importing Chrome profile after removing its imported
+        items with the editor, the removed items are added again.
+        '''
+
+        import json
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.editor import Editor
+        from frostmark.models import Folder, Bookmark, ImportItem
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        def items():
+            session = get_session()
+            try:
+                # all but the internal root are mapped
+                mapped = session.query(ImportItem).count() + 1
+                self.assertEqual(mapped, sum(
+                    session.query(model).count()
+                    for model in (Folder, Bookmark)
+                ))
+                return (
+                    sorted(
+                        item.folder_name for item in session.query(Folder)
+                    ),
+                    sorted(
+                        (item.title, item.folder.folder_name)
+                        for item in session.query(Bookmark)
+                    )
+                )
+            finally:
+                session.close()
+
+        with TemporaryDirectory() as temp:
+            path = join(temp, 'Bookmarks')
+            with open(path, 'w') as fbookmarks:
+                json.dump({'roots': {'bookmark_bar': {
+                    'id': '1', 'guid': 'bar', 'type': 'folder',
+                    'name': 'bar', 'children': [{
+                        'id': '2', 'guid': 'sub', 'type': 'folder',
+                        'name': 'sub', 'children': [{
+                            'id': '3', 'guid': 'inner', 'type': 'url',
+                            'name': 'inner', 'url': 'http://inner'
+                        }]
+                    }, {
+                        'id': '4', 'guid': 'outer', 'type': 'url',
+                        'name': 'outer', 'url': 'http://outer'
+                    }]
+                }}}, fbookmarks)
+
+            expected = (
+                ['<no title>', 'ROOT', 'bar', 'sub'],
+                [('inner', 'sub'), ('outer', 'bar')]
+            )
+            Importer('chrome').import_from(path)
+            self.assertEqual(items(), expected)
+
+            session = get_session()
+            try:
+                inner, outer = [
+                    session.query(Bookmark.id).filter(
+                        Bookmark.title == title
+                    ).scalar() for title in ('inner', 'outer')
+                ]
+                sub = session.query(Folder.id).filter(
+                    Folder.folder_name == 'sub'
+                ).scalar()
+            finally:
+                session.close()
+
+            Editor.remove_bookmark(inner)
+            Editor.remove_bookmark(outer)
+            Editor.remove_folder(sub)
+            self.assertEqual(items(), (['<no title>', 'ROOT', 'bar'], []))
+
+            Importer('chrome').import_from(path, force=True)
+            self.assertEqual(items(), expected)
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_import_parallel(self):
+        '''
+        Test parsing multiple profiles in worker processes
+        while writing them into internal DB in order.
+        '''
+
+        from shutil import copyfile
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Folder, Bookmark, ImportSource
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        sample = join(dirname(abspath(__file__)), 'sample_opera.json')
+        with TemporaryDirectory() as temp:
+            other = join(temp, 'Bookmarks')
+            copyfile(sample, other)
+            Importer('opera').import_many(paths=[sample, other], jobs=2)
+
+        session = get_session()
+        try:
+            # both profiles next to each other, single ROOT
+            self.assertEqual(session.query(Folder).count(), 1 + 2 * 12)
+            self.assertEqual(session.query(Bookmark).count(), 2 * 17)
+            self.assertEqual(
+                [item.path for item in session.query(ImportSource).order_by(
+                    ImportSource.id
+                )],
+                [sample, other]
+            )
+        finally:
+            session.close()
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_import_unchanged(self):
+        '''
+        Test skipping an import of an unchanged file.
+        '''
+
+        from os import utime
+        from shutil import copyfile
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Bookmark, ImportSource
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        with TemporaryDirectory() as temp:
+            path = join(temp, 'Bookmarks')
+            copyfile(join(
+                dirname(abspath(__file__)),
+                'sample_opera.json'
+            ), path)
+
+            importer = Importer('opera')
+            self.assertTrue(importer.import_from(path))
+
+            with patch.object(Importer, 'hash_file') as hash_file:
+                # same size and mtime, not even hashed
+                self.assertFalse(importer.import_from(path))
+                hash_file.assert_not_called()
+
+            # touched, but the same content
+            utime(path, ns=(0, 0))
+            self.assertFalse(importer.import_from(path))
+            self.assertTrue(importer.import_from(path, force=True))
+
+            session = get_session()
+            try:
+                self.assertEqual(session.query(Bookmark).count(), 17)
+                source = session.query(ImportSource).one()
+                self.assertEqual(source.mtime, 0)
+                self.assertEqual(source.digest, importer.hash_file(path))
+            finally:
+                session.close()
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_import_resume(self):
+        '''
+        Test continuing an interrupted import from the last committed
+        chunk and reporting the progress.
+        '''
+
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.models import Folder, Bookmark, ImportItem
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        path = join(dirname(abspath(__file__)), 'sample_opera.json')
+        reported = []
+
+        def interrupt(progress):
+            reported.append((progress.done, progress.total))
+            self.assertGreaterEqual(progress.rate, 0)
+            if progress.done == 12 + 10:
+                raise KeyboardInterrupt()
+
+        # 12 folders and 17 bookmarks in chunks of 5
+        importer = Importer('opera', chunk_size=5)
+        with self.assertRaises(KeyboardInterrupt):
+            importer.import_from(path, progress=interrupt)
+        self.assertEqual(
+            reported, [(5, 29), (10, 29), (12, 29), (17, 29), (22, 29)]
+        )
+
+        session = get_session()
+        try:
+            self.assertEqual(session.query(Folder).count(), 1 + 12)
+            self.assertEqual(session.query(Bookmark).count(), 10)
+        finally:
+            session.close()
+
+        # not skipped as unchanged, only the rest is inserted
+        reported.clear()
+        self.assertTrue(importer.import_from(
+            path, progress=lambda item: reported.append((item.done, item.eta))
+        ))
+        self.assertEqual(
+            [done for done, _ in reported], [12, 17, 22, 27, 29]
+        )
+        self.assertEqual(reported[-1][1], 0)
+
+        session = get_session()
+        try:
+            self.assertEqual(session.query(Folder).count(), 1 + 12)
+            self.assertEqual(session.query(Bookmark).count(), 17)
+            self.assertEqual(session.query(ImportItem).count(), 29)
+        finally:
+            session.close()
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_read_lazy(self):
+        '''
+        Test reading bookmarks lazily in the second pass over the file
+        while only the folders are collected in the first one.
+        '''
+
+        from typing import Iterator
+        from frostmark.importer import Importer
+
+        path = join(dirname(abspath(__file__)), 'sample_chrome.json')
+        _, _, changes = Importer('chrome').read(path, lazy=True)
+
+        self.assertEqual(changes['total'], len(changes['folders']) + 4)
+        self.assertIsInstance(changes['bookmarks'], Iterator)
+        self.assertEqual(len(changes['bookmark_guids']), 0)
+
+        # GUIDs are collected while going through the bookmarks
+        self.assertEqual(len(list(changes['bookmarks'])), 4)
+        self.assertEqual(len(changes['bookmark_guids']), 4)
+
+        _, _, changes = Importer('chrome').read(path)
+        self.assertEqual(len(changes['bookmarks']), 4)
+        self.assertEqual(len(changes['bookmark_guids']), 4)
+
+    def test_read_replaced(self):
+        '''
+        Test aborting the import of a file replaced between the passes
+        instead of mixing the items of both versions.
+        '''
+
+        from os import replace
+        from shutil import copyfile
+        from tempfile import TemporaryDirectory
+        from frostmark.importer import Importer
+
+        sample = join(dirname(abspath(__file__)), 'sample_chrome.json')
+        with TemporaryDirectory() as temp:
+            path = join(temp, 'Bookmarks')
+            copyfile(sample, path)
+            _, _, changes = Importer('chrome').read(path, lazy=True)
+
+            # browsers write a new file and rename it over the old one
+            copyfile(sample, join(temp, 'Bookmarks.new'))
+            replace(join(temp, 'Bookmarks.new'), path)
+            with self.assertRaises(Exception) as error:
+                list(changes['bookmarks'])
+            self.assertIn('changed during the import', str(error.exception))
+
+    def test_import_firefox_icons(self):
+        '''
+        Test importing Firefox favicons stored once per distinct content.
+        '''
+        # pylint: disable=too-many-locals
+
+        import sqlite3
+        from shutil import copyfile
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.common import fetch_bookmark_tree, traverse
+        from frostmark.icons import hash_icon, data_uri
+        from frostmark.models import Bookmark, Icon
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        shared = b'\x89PNG\r\n\x1a\nshared'
+        small = b'\x00\x00\x01\x00small'
+        large = b'\x00\x00\x01\x00large'
+        pages = {
+            'http://www.mozilla.com/en-US/firefox/help/': ((16, shared), ),
+            'http://www.mozilla.com/en-US/about/': ((16, shared), ),
+            'http://portableapps.com/': ((32, large), (16, small))
+        }
+
+        with TemporaryDirectory() as temp:
+            places = join(temp, 'places.sqlite')
+            copyfile(join(
+                dirname(abspath(__file__)),
+                'sample_firefox.sqlite'
+            ), places)
+
+            with closing(sqlite3.connect(
+                    join(temp, 'favicons.sqlite')
+            )) as conn, conn:
+                conn.execute(
+                    'CREATE TABLE moz_icons '
+                    '(id INTEGER PRIMARY KEY, width INTEGER, data BLOB)'
+                )
+                conn.execute(
+                    'CREATE TABLE moz_pages_w_icons '
+                    '(id INTEGER PRIMARY KEY, page_url TEXT)'
+                )
+                conn.execute(
+                    'CREATE TABLE moz_icons_to_pages '
+                    '(page_id INTEGER, icon_id INTEGER)'
+                )
+                for url, icons in pages.items():
+                    page_id = conn.execute(
+                        'INSERT INTO moz_pages_w_icons (page_url) VALUES (?)',
+                        (url, )
+                    ).lastrowid
+                    for width, data in icons:
+                        # Firefox stores an icon per page URL
+                        icon_id = conn.execute(
+                            'INSERT INTO moz_icons (width, data) '
+                            'VALUES (?, ?)', (width, data)
+                        ).lastrowid
+                        conn.execute(
+                            'INSERT INTO moz_icons_to_pages VALUES (?, ?)',
+                            (page_id, icon_id)
+                        )
+
+            Importer('firefox').import_from(places)
+            Importer('firefox').import_from(places, force=True)
+
+        session = get_session()
+        try:
+            self.assertEqual(
+                sorted(icon.hash for icon in session.query(Icon)),
+                sorted([hash_icon(shared), hash_icon(small)])
+            )
+            self.assertEqual(session.query(Bookmark).filter(
+                Bookmark.icon_hash == hash_icon(shared)
+            ).count(), 2)
+            self.assertEqual(session.query(Bookmark).filter(
+                Bookmark.icon_hash.is_(None)
+            ).count(), 9 - 3)
+        finally:
+            session.close()
+
+        icons = {
+            node.title: node.icon
+            for node in traverse(fetch_bookmark_tree(icons=True))
+            if node.node_type == Bookmark
+        }
+        self.assertEqual(
+            icons['PortableApps.com'],
+            data_uri('image/x-icon', small).encode('utf-8')
+        )
+        self.assertEqual(icons['Most Visited'], b'')
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
+
+    def test_import_normalize_icons_pillow(self):
+        '''
+        Test requiring Pillow for normalizing icons only if asked for.
+        '''
+
+        from frostmark.importer import Importer
+
+        with patch('frostmark.icons.Image', None):
+            Importer('firefox')
+            with self.assertRaises(Exception):
+                Importer('firefox', normalize_icons=True)
+
+    @unittest.skipIf(find_spec('PIL') is None, 'Pillow is not installed')
+    def test_import_normalize_icons(self):
+        '''
+        Test downscaling the new icons in a process pool.
+        '''
+
+        from io import BytesIO
+        from concurrent.futures import ProcessPoolExecutor
+        from PIL import Image
+        from frostmark import db_base
+        from frostmark import user_data
+        from frostmark.db import get_session
+        from frostmark.icons import hash_icon
+        from frostmark.models import Icon
+        from frostmark.importer import Importer
+
+        folder = dirname(abspath(user_data.__file__))
+        self.assertNotIn(db_base.DB_NAME, listdir(folder))
+
+        def png(size):
+            output = BytesIO()
+            Image.new('RGBA', (size, size), (255, 0, 0, 255)).save(
+                output, format='PNG'
+            )
+            return output.getvalue()
+
+        large, small, stored = png(256), png(16), png(64)
+        icons = [
+            {'hash': hash_icon(data), 'mime': 'image/png', 'data': data}
+            for data in (large, small, stored, b'<svg></svg>')
+        ]
+
+        session = get_session()
+        session.add(Icon(**icons[2]))
+        session.commit()
+        try:
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                result = Importer('firefox')._normalize_icons(
+                    session=session, icons=icons, icon_pool=pool
+                )
+        finally:
+            session.close()
+
+        # already stored icon is skipped, the rest keeps the hash
+        self.assertEqual(
+            [item['hash'] for item in result],
+            [icons[0]['hash'], icons[1]['hash'], icons[3]['hash']]
+        )
+        for item, size in zip(result, (32, 16)):
+            with Image.open(BytesIO(item['data'])) as image:
+                self.assertEqual(image.size, (size, size))
+        self.assertEqual(result[2]['data'], b'<svg></svg>')
+
+        # remove internal DB
+        remove(join(folder, db_base.DB_NAME))
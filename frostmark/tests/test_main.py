@@ -82,6 +82,74 @@ class MainTestCase(unittest.TestCase):
                 main('__main__')
             export_to.assert_called_once_with(path='PATH')
 
+    def test_main_console_import(self):
+        '''
+        Test importing multiple profiles from console mode.
+        '''
+
+        args = [
+            __file__, 'console', '-j', '2', '-f', '-i', 'opera', 'A', 'B'
+        ]
+        import_many = MagicMock()
+        import_patch = patch(
+            target='frostmark.importer.Importer.import_many',
+            new=import_many
+        )
+        with patch('sys.stdout'), patch('sys.argv', args), import_patch:
+            from frostmark.__main__ import main
+            with self.assertRaises(SystemExit):
+                main('__main__')
+            from frostmark.importer.progress import print_progress
+            import_many.assert_called_once_with(
+                paths=['A', 'B'], jobs=2, force=True,
+                progress=print_progress
+            )
+
+    def test_main_console_database(self):
+        '''
+        Test using a different database from console mode.
+        '''
+
+        from os.path import join, exists
+        from tempfile import TemporaryDirectory
+        from frostmark import db_base
+
+        original = db_base.DB_PATH
+        with TemporaryDirectory() as temp:
+            path = join(temp, 'other.sqlite')
+            args = [__file__, 'console', '--database', path, '-l']
+            try:
+                with patch('sys.stdout'), patch('sys.argv', args):
+                    from frostmark.__main__ import main
+                    with self.assertRaises(SystemExit):
+                        main('__main__')
+                self.assertEqual(db_base.DB_PATH, path)
+                self.assertTrue(exists(path))
+            finally:
+                db_base.use_database(original)
+
+    def test_main_startup(self):
+        '''
+        Test parsing the arguments without importing the heavy modules
+        which are needed only by some of the arguments.
+        '''
+
+        import sys
+        from os.path import dirname, abspath
+        from subprocess import check_output
+        import frostmark
+
+        modules = check_output([
+            sys.executable, '-c',
+            'import sys, frostmark.__main__; print(*sys.modules)'
+        ], cwd=dirname(dirname(abspath(frostmark.__file__)))).split()
+
+        for module in (
+                b'sqlalchemy', b'anytree', b'frostmark.db_base',
+                b'frostmark.importer', b'frostmark.exporter'
+        ):
+            self.assertNotIn(module, modules)
+
     def test_main_console_changeparentfolder(self):
         '''
         Test changing parent for folder from console.
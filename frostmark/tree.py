@@ -0,0 +1,137 @@
+'''
+Module for a compact bookmark tree structure.
+'''
+
+from importlib.util import find_spec
+from typing import Iterator
+
+from ensure import ensure_annotations
+
+
+class TreeNode:
+    '''
+    Node of a bookmark tree holding a folder or a bookmark item.
+
+    Only the item fields from `FIELDS` are kept in fixed slots, a field
+    missing in the item is not set at all, therefore ``getattr()`` with
+    a default or ``hasattr()`` tell folders and bookmarks apart the same
+    way as with the item dictionaries.
+
+    Children are kept in a plain list in the order they are added,
+    nothing is validated when attaching a child (e.g. cycles).
+    '''
+    # pylint: disable=too-few-public-methods
+
+    FIELDS = (
+        'id', 'guid', 'folder_name', 'parent_folder_id',
+        'title', 'url', 'folder_id', 'icon', 'icon_hash'
+    )
+    __slots__ = ('parent', 'children', 'node_type') + FIELDS
+
+    def __init__(self, node_type, item: dict):
+        self.parent = None
+        self.children = []
+        self.node_type = node_type
+        for key in self.FIELDS:
+            if key in item:
+                setattr(self, key, item[key])
+
+    def add_child(self, child):
+        '''
+        Append a `child` node and point it to this node as its parent.
+        '''
+        child.parent = self
+        self.children.append(child)
+
+    def as_dict(self) -> dict:
+        '''
+        Return the item fields set for the node and its `node_type`.
+        '''
+        result = {'node_type': self.node_type}
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                result[key] = getattr(self, key)
+        return result
+
+    def __repr__(self):
+        return (
+            "<TreeNode("
+            "node_type=%s, id=%s, children=%s"
+            ")>" % (
+                getattr(self.node_type, '__name__', self.node_type),
+                getattr(self, 'id', None), len(self.children)
+            )
+        )
+
+
+@ensure_annotations
+def traverse(root: TreeNode) -> list:
+    '''
+    Traverse a tree from the root node down to the last child (pre-order)
+    and return a flat list of tree nodes.
+
+    An explicit stack is used instead of recursion, no depth limit.
+    '''
+
+    nodes = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.children))
+    return nodes
+
+
+@ensure_annotations
+def render_tree(root: TreeNode) -> Iterator:
+    '''
+    Yield ``(prefix, node)`` for each node in pre-order where the prefix
+    draws the tree with ASCII lines the same way as anytree's `RenderTree`
+    with `AsciiStyle` does.
+    '''
+
+    # node, its prefix, prefix of its children
+    stack = [(root, '', '')]
+    while stack:
+        node, prefix, fill = stack.pop()
+        yield (prefix, node)
+
+        last = len(node.children) - 1
+        for idx in range(last, -1, -1):
+            child = node.children[idx]
+            if idx == last:
+                stack.append((child, fill + '+-- ', fill + '    '))
+            else:
+                stack.append((child, fill + '|-- ', fill + '|   '))
+
+
+@ensure_annotations
+def require_anytree():
+    '''
+    Raise an exception if anytree needed for `to_anytree` is missing.
+    '''
+    # looked up only, imported lazily by to_anytree()
+    if find_spec('anytree') is None:
+        raise Exception(
+            'anytree is required for converting trees, '
+            'install frostmark[anytree]'
+        )
+
+
+@ensure_annotations
+def to_anytree(root: TreeNode):
+    '''
+    Convert a tree into anytree `Node` objects (e.g. for its rendering
+    or searching utilities), return the root `Node`.
+    '''
+    require_anytree()
+    from anytree import Node
+
+    converted = {}
+    for node in traverse(root):
+        converted[id(node)] = Node(
+            name=getattr(node, 'id', None),
+            parent=converted.get(id(node.parent)),
+            **node.as_dict()
+        )
+    return converted[id(root)]
@@ -86,17 +86,20 @@ setup(
             f'fmgui = {NAME}.__main__:main_gui'
         ]
     },
-    install_requires=['ensure', 'sqlalchemy', 'anytree'],
+    install_requires=['ensure', 'sqlalchemy'],
     extras_require={
         'dev': ['pycodestyle', 'pylint', 'coverage'],
         'ci': ['coveralls'],
         'doc': ['sphinx>=1.8.1'],
         'gui_react': ['flask'],
+        'icons': ['pillow'],
+        'snapshot': ['numpy'],
+        'anytree': ['anytree'],
         'release': [
             'setuptools', 'wheel',
             'pycodestyle', 'pylint',
             'coverage', 'coveralls', 'sphinx>=1.8.1',
-            'flask', 'twine'
+            'flask', 'pillow', 'numpy', 'anytree', 'twine'
         ]
     },
     include_package_data=True,